@@ -1,82 +1,300 @@
-from flask import Flask
-from flask_cors import CORS
-from models import db
 import os
+import click
+from flask import Flask, current_app, request
+from flask.cli import with_appcontext
 from dotenv import load_dotenv
-from sqlalchemy import text
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-# Support both MySQL and SQLite for easy setup
-database_url = os.getenv('DATABASE_URL')
-if not database_url:
-    # Use SQLite as fallback for easy local development; ensure absolute path
-    basedir = os.path.dirname(os.path.abspath(__file__))
-    sqlite_path = os.path.join(basedir, 'task_manager.db')
-    database_url = f'sqlite:///{sqlite_path}'
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['CORS_ORIGINS'] = os.getenv('CORS_ORIGINS', '*')
-
-# Initialize extensions
-db.init_app(app)
-# Dev-friendly CORS: allow any origin if set to '*', otherwise use provided list
-if app.config['CORS_ORIGINS'] == '*':
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
-else:
-    CORS(app, origins=app.config['CORS_ORIGINS'].split(','), supports_credentials=True)
-
-# Import routes
-from routes.auth_routes import auth_bp
-from routes.task_routes import task_bp
-from routes.analytics_routes import analytics_bp
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(task_bp, url_prefix='/api/tasks')
-app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
-
-
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return {'status': 'healthy', 'message': 'Task Manager API is running'}, 200
-
-
-@app.route('/', methods=['GET'])
-def root():
-    """Friendly root message to help local testing"""
-    return {
-        'message': 'Smart Task & Productivity Manager API',
-        'endpoints': {
-            'health': '/api/health',
-            'auth': '/api/auth/*',
-            'tasks': '/api/tasks/*',
-            'analytics': '/api/analytics/*'
-        }
-    }, 200
+from models import db
+from utils.sharding import parse_shard_urls, bind_key_for
+from utils.archive import MIN_ARCHIVE_AFTER_DAYS
 
 
-if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # SQLite migration helper for dev: add completed_at if missing
-        try:
-            engine = db.engine
-            if engine.name == 'sqlite':
-                with engine.connect() as conn:
-                    cols = conn.execute(text("PRAGMA table_info(tasks)")).fetchall()
-                    col_names = {c[1] for c in cols}
-                    if 'completed_at' not in col_names:
-                        conn.execute(text('ALTER TABLE tasks ADD COLUMN completed_at DATETIME NULL'))
-                        conn.commit()
-        except Exception:
-            pass
-    app.run(debug=True, host='0.0.0.0', port=5000)
+def load_config(app):
+    """Populate app.config from the environment"""
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
+    # Support both MySQL and SQLite for easy setup
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        # Use SQLite as fallback for easy local development; ensure absolute path
+        basedir = os.path.dirname(os.path.abspath(__file__))
+        sqlite_path = os.path.join(basedir, 'task_manager.db')
+        database_url = f'sqlite:///{sqlite_path}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Optional user-keyed sharding: SHARD_URLS=name=url,name=url (see utils/sharding.py).
+    # The default database then only holds the user directory.
+    app.config['SHARDS'] = parse_shard_urls(os.getenv('SHARD_URLS'))
+    app.config['SQLALCHEMY_BINDS'] = {bind_key_for(name): url for name, url in app.config['SHARDS'].items()}
+    app.config['CORS_ORIGINS'] = os.getenv('CORS_ORIGINS', '*')
+    # Completed tasks older than this are moved to archived_tasks by `flask archive-tasks`
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+    if app.config['ARCHIVE_AFTER_DAYS'] < MIN_ARCHIVE_AFTER_DAYS:
+        raise ValueError(f'ARCHIVE_AFTER_DAYS must be at least {MIN_ARCHIVE_AFTER_DAYS}')
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+    # Deadline reminders (`flask reminders run`); events go to the log and,
+    # if set, are POSTed to REMINDER_WEBHOOK_URL
+    app.config['REMINDER_WEBHOOK_URL'] = os.getenv('REMINDER_WEBHOOK_URL')
+    app.config['REMINDER_HORIZON_DAYS'] = int(os.getenv('REMINDER_HORIZON_DAYS', '7'))
+    # 'lazy' creates missing tables on the first real request; 'off' leaves the
+    # schema alone (e.g. MySQL initialised from database/schema.sql)
+    app.config['SCHEMA_CHECK'] = os.getenv('SCHEMA_CHECK', 'lazy')
+    # Pomodoro events are buffered and written once this many have arrived
+    # or the oldest has waited this many seconds (see utils/pomodoro.py)
+    app.config['POMODORO_FLUSH_SIZE'] = int(os.getenv('POMODORO_FLUSH_SIZE', '100'))
+    app.config['POMODORO_FLUSH_SECONDS'] = float(os.getenv('POMODORO_FLUSH_SECONDS', '5'))
+    # Online SQLite backups (`flask backups create`, POST /api/admin/backups).
+    # BACKUP_DIR defaults to a backups/ folder next to the database.
+    app.config['BACKUP_DIR'] = os.getenv('BACKUP_DIR')
+    app.config['BACKUP_KEEP'] = int(os.getenv('BACKUP_KEEP', '7'))
+    app.config['BACKUP_PAGES_PER_STEP'] = int(os.getenv('BACKUP_PAGES_PER_STEP', '100'))
+    app.config['BACKUP_STEP_SLEEP'] = float(os.getenv('BACKUP_STEP_SLEEP', '0.005'))
+    # SQLite runs in WAL mode so readers, backups included, never block writers
+    app.config['SQLITE_WAL'] = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+
+
+def create_app(config=None):
+    """Application factory.
+
+    Building the app only reads configuration and registers routes; engines
+    do not connect and the schema is not checked until the first request
+    that needs the database, which keeps cold starts short.
+    """
+    # Load environment variables
+    load_dotenv()
+
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions
+    db.init_app(app)
+    from utils.pomodoro import init_app as init_pomodoro
+    init_pomodoro(app)
+    from utils.backup import init_app as init_backups
+    init_backups(app)
+    from flask_cors import CORS
+    # Dev-friendly CORS: allow any origin if set to '*', otherwise use provided list
+    # ETag is exposed so clients can send it back in If-Match
+    if app.config['CORS_ORIGINS'] == '*':
+        CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=['ETag'])
+    else:
+        CORS(app, origins=app.config['CORS_ORIGINS'].split(','), supports_credentials=True,
+             expose_headers=['ETag'])
+
+    # Import routes
+    from routes.auth_routes import auth_bp
+    from routes.task_routes import task_bp
+    from routes.analytics_routes import analytics_bp
+    from routes.series_routes import series_bp
+    from routes.pomodoro_routes import pomodoro_bp
+    from routes.admin_routes import admin_bp
+
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(task_bp, url_prefix='/api/tasks')
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(series_bp, url_prefix='/api/tasks/series')
+    app.register_blueprint(pomodoro_bp, url_prefix='/api/pomodoro')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+    @app.before_request
+    def refuse_unimported_users():
+        """With sharding on, serve nothing while users remain in the default database"""
+        if not app.config['SHARDS'] or app.extensions.get('shards_imported'):
+            return
+        if request.endpoint in ('health_check', 'root'):
+            return
+        from utils.sharding import default_database_users
+        if default_database_users():
+            # They would be invisible: logins fail and their emails could be registered again
+            app.logger.error('Users from before sharding are still in DATABASE_URL; run `flask shards import`')
+            return {'message': 'Database migration pending, please retry later'}, 503
+        app.extensions['shards_imported'] = True
+
+    @app.before_request
+    def lazy_schema_check():
+        """Check the schema once, on the first request that touches the database"""
+        if app.config['SCHEMA_CHECK'] != 'lazy' or app.extensions.get('schema_ready'):
+            return
+        if request.endpoint in ('health_check', 'root'):
+            return
+        from utils.schema import ensure_schema
+        ensure_schema()
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        return {'status': 'healthy', 'message': 'Task Manager API is running'}, 200
+
+    @app.route('/', methods=['GET'])
+    def root():
+        """Friendly root message to help local testing"""
+        return {
+            'message': 'Smart Task & Productivity Manager API',
+            'endpoints': {
+                'health': '/api/health',
+                'auth': '/api/auth/*',
+                'tasks': '/api/tasks/*',
+                'analytics': '/api/analytics/*',
+                'pomodoro': '/api/pomodoro/*'
+            }
+        }, 200
+
+    app.cli.add_command(archive_tasks_command)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(rebuild_categories_command)
+    app.cli.add_command(backups_cli)
+
+    return app
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables (the same check the first request would run)"""
+    from utils.schema import ensure_schema
+    ensure_schema()
+    click.echo('Database schema is up to date')
+
+
+@click.command('archive-tasks')
+@click.option('--days', type=int, default=None, help='Archive tasks completed more than this many days ago')
+@click.option('--batch-size', type=int, default=None, help='Tasks moved per transaction')
+@with_appcontext
+def archive_tasks_command(days, batch_size):
+    """Move old completed tasks into the archive table"""
+    from utils.archive import archive_completed_tasks
+    from utils.sharding import for_each_shard
+    if days is not None and days < MIN_ARCHIVE_AFTER_DAYS:
+        raise click.BadParameter(f'must be at least {MIN_ARCHIVE_AFTER_DAYS}', param_hint='--days')
+    archived = 0
+    for _ in for_each_shard():
+        archived += archive_completed_tasks(
+            older_than_days=days if days is not None else current_app.config['ARCHIVE_AFTER_DAYS'],
+            batch_size=batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+        )
+    click.echo(f'Archived {archived} task(s)')
+
+
+@click.command('rebuild-categories')
+@with_appcontext
+def rebuild_categories_command():
+    """Recompute category usage counts from the tasks (for databases that predate them)"""
+    from utils.categories import rebuild_category_counts
+    from utils.sharding import for_each_shard
+    written = 0
+    for _ in for_each_shard():
+        written += rebuild_category_counts()
+    click.echo(f'Rebuilt {written} category count(s)')
 
+
+@click.group('shards')
+def shards_cli():
+    """Manage user-keyed database shards"""
+
+
+@shards_cli.command('init')
+@with_appcontext
+def shards_init_command():
+    """Create the directory tables and the per-user tables on every shard"""
+    from utils.sharding import create_shard_tables
+    db.create_all()
+    create_shard_tables()
+    click.echo(f"Initialized {len(current_app.config['SHARDS'])} shard(s)")
+
+
+@shards_cli.command('import')
+@with_appcontext
+def shards_import_command():
+    """Move users from the default database (from before sharding) onto the shards"""
+    from utils.sharding import create_shard_tables, import_default_database
+    db.create_all()
+    create_shard_tables()
+    imported = import_default_database()
+    for user_id, shard in imported:
+        click.echo(f'user {user_id} -> {shard}')
+    click.echo(f'Imported {len(imported)} user(s)')
+
+
+@shards_cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only print the moves that would be made')
+@click.option('--drain-seconds', type=float, default=1.0, help='Wait for in-flight requests of a moving user')
+@with_appcontext
+def shards_rebalance_command(dry_run, drain_seconds):
+    """Move users whose shard no longer matches the hash ring"""
+    from utils.sharding import rebalance
+    moves = rebalance(dry_run=dry_run, drain_seconds=drain_seconds)
+    for user_id, source, target in moves:
+        click.echo(f'user {user_id}: {source} -> {target}')
+    click.echo(f"{'Would move' if dry_run else 'Moved'} {len(moves)} user(s)")
+
+
+
+@click.group('backups')
+def backups_cli():
+    """Online backups of the SQLite database(s)"""
+
+
+@backups_cli.command('create')
+@with_appcontext
+def backups_create_command():
+    """Take a compressed, integrity-checked snapshot without stopping the app"""
+    from utils.backup import backup_from_config
+    results = backup_from_config()
+    if not results:
+        click.echo('No SQLite database to back up')
+    for result in results:
+        click.echo(f"{result['path']}: {result['pages']} pages in {result['steps']} steps ({result['journal_mode']}), "
+                   f"{result['compressed_bytes']} bytes, {result['total_seconds']}s")
+        for path in result['rotated']:
+            click.echo(f'  removed {path}')
+
+
+@backups_cli.command('list')
+@with_appcontext
+def backups_list_command():
+    """List existing snapshots, newest first"""
+    from utils.backup import backup_dir, list_backups
+    dest_dir = backup_dir(current_app, db.engine)
+    for path in list_backups(dest_dir) if dest_dir else []:
+        click.echo(f'{path} ({os.path.getsize(path)} bytes)')
+
+
+@backups_cli.command('verify')
+@click.argument('path')
+def backups_verify_command(path):
+    """Decompress a snapshot and run an integrity check on it"""
+    from utils.backup import verify_backup
+    if not verify_backup(path):
+        raise click.ClickException(f'{path} failed its integrity check')
+    click.echo(f'{path}: ok')
+
+
+@click.group('reminders')
+def reminders_cli():
+    """Deadline reminder scheduler"""
+
+
+@reminders_cli.command('run')
+@click.option('--interval', type=float, default=60.0, help='Seconds between scheduler ticks')
+@click.option('--once', is_flag=True, help='Run a single tick (e.g. from cron) and exit')
+@with_appcontext
+def reminders_run_command(interval, once):
+    """Emit due/overdue events for pending task deadlines"""
+    import logging
+    from utils.reminders import DeadlineScheduler, log_sink, webhook_sink
+    logging.basicConfig(level=logging.INFO)
+    sinks = [log_sink]
+    if current_app.config['REMINDER_WEBHOOK_URL']:
+        sinks.append(webhook_sink(current_app.config['REMINDER_WEBHOOK_URL']))
+    scheduler = DeadlineScheduler(horizon_days=current_app.config['REMINDER_HORIZON_DAYS'], sinks=sinks)
+    if once:
+        events = scheduler.tick()
+        click.echo(f'Emitted {len(events)} reminder(s)')
+    else:
+        scheduler.run_forever(interval=interval)
+
+if __name__ == '__main__':
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,88 @@
+"""Ranking benchmark for /api/tasks/next on a large backlog.
+
+Loads one user with many pending tasks into a fresh SQLite database, then
+compares the streamed top-k heap against loading and sorting every task.
+
+    python benchmarks/bench_next.py --tasks 100000 --k 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.pop('SHARD_URLS', None)
+    from app import create_app
+    from models import db, User, Task, TaskStatus, TaskPriority
+    from utils.ranking import DEFAULT_WEIGHTS, score_task, top_pending_tasks
+    from utils.schema import ensure_schema
+    app = create_app()
+
+    with app.app_context():
+        ensure_schema()
+        user = User(name='Bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+        rng = random.Random(0)
+        now = datetime.utcnow()
+        priorities = list(TaskPriority)
+        db.session.execute(Task.__table__.insert(), [{
+            'user_id': user.id,
+            'title': f'Task {i}',
+            'priority': rng.choice(priorities).name,
+            'status': TaskStatus.PENDING.name,
+            'deadline': (now + timedelta(days=rng.randint(-10, 60))).date() if rng.random() < 0.7 else None,
+            'created_at': now - timedelta(days=rng.randint(0, 90)),
+            'updated_at': now,
+            'version': 1,
+        } for i in range(args.tasks)])
+        db.session.commit()
+
+        def full_sort():
+            tasks = Task.query.filter_by(user_id=user.id, status=TaskStatus.PENDING).all()
+            tasks.sort(key=lambda t: score_task(t.priority, t.deadline, t.created_at, t.category,
+                                                DEFAULT_WEIGHTS, now), reverse=True)
+            return tasks[:args.k]
+
+        heap_result, heap_ms = timed(lambda: top_pending_tasks(user.id, args.k, DEFAULT_WEIGHTS, now), args.repeat)
+        db.session.expunge_all()
+        sort_result, sort_ms = timed(full_sort, args.repeat)
+
+        # Compare scores: tasks with equal scores may come back in either order
+        sort_scores = [score_task(t.priority, t.deadline, t.created_at, t.category, DEFAULT_WEIGHTS, now)
+                       for t in sort_result]
+        same = [round(score, 6) for score, _ in heap_result] == [round(score, 6) for score in sort_scores]
+        print(f'   tasks: {args.tasks} pending, k={args.k}')
+        print(f'top-k heap: {heap_ms:.1f} ms (median of {args.repeat})')
+        print(f' full sort: {sort_ms:.1f} ms')
+        print(f' same top-k: {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Cold-start benchmark: import time and time to first request.
+
+Each run starts a fresh interpreter against a fresh SQLite database, so the
+numbers include everything a cold container pays before serving traffic.
+
+    python benchmarks/bench_startup.py --runs 5 --save startup.json
+    python benchmarks/bench_startup.py --baseline startup.json  # exits 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter and prints one JSON line of timings (ms)
+CHILD = r'''
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/api/health')
+t3 = time.perf_counter()
+# First request that touches the database (runs the lazy schema check)
+client.post('/api/auth/login', json={'email': 'nobody@example.com', 'password': 'x'})
+t4 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t3 - t2) * 1000,
+    'first_db_request_ms': (t4 - t3) * 1000,
+    'total_ms': (t4 - t0) * 1000,
+}))
+'''
+
+
+def run_once():
+    """Time one cold start in a fresh interpreter"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        env.pop('SHARD_URLS', None)
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+            check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', help='Write the median timings to this JSON file')
+    parser.add_argument('--baseline', help='Compare against timings saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown over the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    medians = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+    for key, value in medians.items():
+        print(f'{key:>22}: {value:8.1f} ms')
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(medians, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = [
+            key for key in ('import_ms', 'total_ms')
+            if key in baseline and medians[key] > baseline[key] * (1 + args.tolerance)
+        ]
+        for key in regressions:
+            print(f'REGRESSION {key}: {medians[key]:.1f} ms vs baseline {baseline[key]:.1f} ms')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
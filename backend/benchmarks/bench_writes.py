@@ -0,0 +1,77 @@
+"""Concurrent mutation benchmark for the task write path.
+
+Several threads toggle and update the same tasks through the API against a
+fresh SQLite database and report per-request latency percentiles.
+
+    python benchmarks/bench_writes.py --threads 8 --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+    parser.add_argument('--tasks', type=int, default=4, help='Tasks shared by all threads')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.pop('SHARD_URLS', None)
+    from app import create_app
+    app = create_app()
+
+    client = app.test_client()
+    response = client.post('/api/auth/register', json={
+        'email': 'bench@example.com', 'password': 'bench', 'name': 'Bench'
+    })
+    headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+    task_ids = [
+        client.post('/api/tasks/', json={'title': f'Task {i}'}, headers=headers).get_json()['task']['id']
+        for i in range(args.tasks)
+    ]
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(seed):
+        thread_client = app.test_client()
+        for i in range(args.requests):
+            task_id = task_ids[(seed + i) % len(task_ids)]
+            start = time.perf_counter()
+            if i % 2:
+                r = thread_client.put(f'/api/tasks/{task_id}/complete', headers=headers)
+            else:
+                r = thread_client.put(f'/api/tasks/{task_id}', json={'description': f'edit {i}'}, headers=headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'requests: {len(latencies)} in {wall:.2f}s ({len(latencies) / wall:.0f} req/s)')
+    print(f'     p50: {statistics.median(latencies):.2f} ms')
+    print(f'     p95: {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms')
+    print(f'     max: {latencies[-1]:.2f} ms')
+    print(f'statuses: {statuses}')
+
+
+if __name__ == '__main__':
+    main()
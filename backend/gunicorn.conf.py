@@ -0,0 +1,27 @@
+import os
+
+# Import the app once in the master and fork workers from it, so each worker
+# starts without re-importing Flask, SQLAlchemy and the routes
+preload_app = True
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Drop any engine connections inherited from the master"""
+    from models import db
+    from wsgi import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """Write buffered Pomodoro sessions before the worker goes away"""
+    from wsgi import app
+    app.extensions['pomodoro_buffer'].flush()
@@ -2,8 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from enum import Enum
+from utils.shard_session import ShardedSession
 
-db = SQLAlchemy()
+# The session routes per-user tables to a shard when SHARDS is configured
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 
 
 class UserRole(Enum):
@@ -31,9 +33,19 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.Enum(UserRole), default=UserRole.USER, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped in the same transaction as any write to the user's tasks; keys
+    # cached per-user task aggregates (see utils/facets.py)
+    task_generation = db.Column(db.Integer, default=0, nullable=False)
+    # Bumped only when the user's category usage counts change; keys the
+    # in-memory autocomplete index (see utils/categories.py)
+    category_generation = db.Column(db.Integer, default=0, nullable=False)
     
     # Relationship
     tasks = db.relationship('Task', backref='user', lazy=True, cascade='all, delete-orphan')
+    archived_tasks = db.relationship('ArchivedTask', backref='user', lazy=True, cascade='all, delete-orphan')
+    task_series = db.relationship('TaskSeries', backref='user', lazy=True, cascade='all, delete-orphan')
+    pomodoro_sessions = db.relationship('PomodoroSession', backref='user', lazy=True, cascade='all, delete-orphan')
+    task_categories = db.relationship('TaskCategory', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Hash and set the user's password"""
@@ -57,6 +69,20 @@ class User(db.Model):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # /api/tasks/due: one user's pending tasks by deadline
+        db.Index('idx_tasks_user_status_deadline', 'user_id', 'status', 'deadline'),
+        # /api/tasks/facets: covers the grouped count of one user's tasks
+        db.Index('idx_tasks_user_facets', 'user_id', 'status', 'priority', 'category'),
+        # Reminder scheduler: upcoming pending deadlines across all users
+        db.Index('idx_tasks_status_deadline', 'status', 'deadline'),
+        # Reminder scheduler change feed
+        db.Index('idx_tasks_updated_at', 'updated_at'),
+        # At most one materialized task per occurrence of a recurring series
+        db.Index('uq_tasks_series_occurrence', 'series_id', 'occurrence_date', unique=True),
+        # Never hand out the id of an archived task again
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -69,6 +95,11 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     completed_at = db.Column(db.DateTime, nullable=True)
+    # Bumped on every write; clients send it back in If-Match to reject stale writes
+    version = db.Column(db.Integer, default=1, nullable=False)
+    # Set when this task is a materialized occurrence of a recurring series
+    series_id = db.Column(db.Integer, db.ForeignKey('task_series.id'), nullable=True)
+    occurrence_date = db.Column(db.Date, nullable=True)
     
     def to_dict(self):
         """Convert task object to dictionary"""
@@ -83,6 +114,173 @@ class Task(db.Model):
             'status': self.status.value,
             'created_at': f"{self.created_at.isoformat()}Z",
             'updated_at': f"{self.updated_at.isoformat()}Z",
-            'completed_at': f"{self.completed_at.isoformat()}Z" if self.completed_at else None
+            'completed_at': f"{self.completed_at.isoformat()}Z" if self.completed_at else None,
+            'version': self.version,
+            'series_id': self.series_id,
+            'occurrence_date': self.occurrence_date.isoformat() if self.occurrence_date else None
         }
 
+
+
+class TaskCategory(db.Model):
+    """How many of a user's tasks use a category, kept current on task writes (see utils/categories.py)"""
+    __tablename__ = 'task_categories'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_task_categories_user_name'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+    usage_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def to_dict(self):
+        """Convert category object to dictionary"""
+        return {
+            'name': self.name,
+            'count': self.usage_count
+        }
+
+
+class TaskSeries(db.Model):
+    """A recurring task, stored once; occurrences are expanded on demand (see utils/recurrence.py)"""
+    __tablename__ = 'task_series'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    category = db.Column(db.String(50), nullable=True)
+    priority = db.Column(db.Enum(TaskPriority), default=TaskPriority.MEDIUM, nullable=False)
+    # Recurrence rule: 'daily', 'weekly' or 'monthly' every `interval` periods
+    frequency = db.Column(db.String(10), nullable=False)
+    interval = db.Column(db.Integer, default=1, nullable=False)
+    by_weekday = db.Column(db.String(30), nullable=True)  # e.g. "MO,WE,FR" (weekly)
+    by_monthday = db.Column(db.Integer, nullable=True)  # 1-31 (monthly)
+    start_date = db.Column(db.Date, nullable=False)
+    until = db.Column(db.Date, nullable=True)
+    count = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert series object to dictionary"""
+        from utils.recurrence import format_rrule
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'title': self.title,
+            'description': self.description,
+            'category': self.category,
+            'priority': self.priority.value,
+            'frequency': self.frequency,
+            'interval': self.interval,
+            'by_weekday': self.by_weekday,
+            'by_monthday': self.by_monthday,
+            'start_date': self.start_date.isoformat(),
+            'until': self.until.isoformat() if self.until else None,
+            'count': self.count,
+            'rrule': format_rrule(self),
+            'created_at': f"{self.created_at.isoformat()}Z",
+            'updated_at': f"{self.updated_at.isoformat()}Z"
+        }
+
+class PomodoroSession(db.Model):
+    """A focus session reported by the Pomodoro timer (written in batches, see utils/pomodoro.py)"""
+    __tablename__ = 'pomodoro_sessions'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'client_session_id', name='uq_pomodoro_user_session'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Plain column rather than a foreign key so sessions outlive archived/deleted tasks
+    task_id = db.Column(db.Integer, nullable=True, index=True)
+    # Id generated by the client for the session, so repeated events update one row
+    client_session_id = db.Column(db.String(64), nullable=False)
+    label = db.Column(db.String(50), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=True)
+    planned_seconds = db.Column(db.Integer, nullable=True)
+    focus_seconds = db.Column(db.Integer, default=0, nullable=False)
+    completed = db.Column(db.Boolean, default=False, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert session object to dictionary"""
+        return {
+            'id': self.id,
+            'session_id': self.client_session_id,
+            'task_id': self.task_id,
+            'label': self.label,
+            'started_at': f"{self.started_at.isoformat()}Z",
+            'ended_at': f"{self.ended_at.isoformat()}Z" if self.ended_at else None,
+            'planned_seconds': self.planned_seconds,
+            'focus_seconds': self.focus_seconds,
+            'completed': self.completed
+        }
+
+class ArchivedTask(db.Model):
+    """Cold storage for tasks completed long ago (see utils/archive.py)"""
+    __tablename__ = 'archived_tasks'
+    
+    # Keeps the id the task had in the hot table
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    category = db.Column(db.String(50), nullable=True)
+    priority = db.Column(db.Enum(TaskPriority), nullable=False)
+    deadline = db.Column(db.Date, nullable=True)
+    status = db.Column(db.Enum(TaskStatus), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    series_id = db.Column(db.Integer, nullable=True, index=True)
+    occurrence_date = db.Column(db.Date, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert archived task to the same shape as a live task"""
+        data = Task.to_dict(self)
+        data['archived'] = True
+        return data
+
+
+class ArchiveSummary(db.Model):
+    """Precomputed per-user analytics over archived tasks"""
+    __tablename__ = 'archive_summaries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_tasks = db.Column(db.Integer, default=0, nullable=False)
+    category_counts = db.Column(db.JSON, default=dict, nullable=False)
+    priority_counts = db.Column(db.JSON, default=dict, nullable=False)
+    day_counts = db.Column(db.JSON, default=dict, nullable=False)
+    hour_counts = db.Column(db.JSON, default=dict, nullable=False)
+    # Sum/count of completion durations under 30 days, matching
+    # calculate_average_completion_time
+    completion_seconds = db.Column(db.Float, default=0.0, nullable=False)
+    completion_samples = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class UserDirectory(db.Model):
+    """Global user index kept on the default database when sharding is enabled"""
+    __tablename__ = 'user_directory'
+    __table_args__ = {'info': {'directory': True}}
+    
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    email = db.Column(db.String(120), unique=True, nullable=False, index=True)
+    shard = db.Column(db.String(50), nullable=False)
+    # 'active' or 'moving' (while utils/sharding.move_user copies the user's rows)
+    state = db.Column(db.String(20), default='active', nullable=False)
+
+
+class IdBlock(db.Model):
+    """High-water marks for ids handed out across shards"""
+    __tablename__ = 'id_blocks'
+    __table_args__ = {'info': {'directory': True}}
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,49 @@
+import os
+from flask import Blueprint, jsonify, current_app
+from models import db
+from utils.auth import admin_required
+from utils.backup import start_backup, backup_running, backup_dir, list_backups, BackupInProgress
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/backups', methods=['POST'])
+@admin_required
+def create_backup(**kwargs):
+    """Start an online backup of the SQLite database(s); poll GET /backups for the result"""
+    try:
+        # Runs in the background: a large copy would outlive the worker timeout
+        if not start_backup(current_app._get_current_object()):
+            return jsonify({'message': 'No SQLite database to back up'}), 400
+        
+        return jsonify({
+            'message': 'Backup started'
+        }), 202
+    
+    except BackupInProgress as e:
+        return jsonify({'message': str(e)}), 409
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to create backup: {str(e)}'}), 500
+
+
+@admin_bp.route('/backups', methods=['GET'])
+@admin_required
+def get_backups(**kwargs):
+    """List existing backups, newest first"""
+    try:
+        dest_dir = backup_dir(current_app, db.engine)
+        backups = [
+            {'name': os.path.relpath(path, dest_dir), 'size_bytes': os.path.getsize(path)}
+            for path in (list_backups(dest_dir) if dest_dir else [])
+        ]
+        
+        return jsonify({
+            'backups': backups,
+            'count': len(backups),
+            'running': backup_running(),
+            'last_backup': current_app.extensions.get('last_backup')
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to list backups: {str(e)}'}), 500
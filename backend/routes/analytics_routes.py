@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify
-from models import Task, TaskStatus
+from models import Task, TaskStatus, PomodoroSession
 from utils.auth import token_required
 from utils.helpers import (
     calculate_productivity_stats,
     get_weekly_productivity,
     get_most_productive_time,
-    calculate_average_completion_time
+    calculate_average_completion_time,
+    get_focus_distribution
 )
+from utils.archive import get_archive_summary
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -18,7 +20,7 @@ def get_productivity_stats(current_user_id, **kwargs):
     try:
         tasks = Task.query.filter_by(user_id=current_user_id).all()
         
-        stats = calculate_productivity_stats(tasks)
+        stats = calculate_productivity_stats(tasks, get_archive_summary(current_user_id))
         
         return jsonify({
             'stats': stats
@@ -52,7 +54,7 @@ def get_productive_time(current_user_id, **kwargs):
     try:
         tasks = Task.query.filter_by(user_id=current_user_id).all()
         
-        productive_time = get_most_productive_time(tasks)
+        productive_time = get_most_productive_time(tasks, get_archive_summary(current_user_id))
         
         return jsonify({
             'productive_time': productive_time
@@ -69,7 +71,7 @@ def get_completion_time(current_user_id, **kwargs):
     try:
         tasks = Task.query.filter_by(user_id=current_user_id).all()
         
-        avg_completion = calculate_average_completion_time(tasks)
+        avg_completion = calculate_average_completion_time(tasks, get_archive_summary(current_user_id))
         
         if not avg_completion:
             return jsonify({
@@ -85,6 +87,21 @@ def get_completion_time(current_user_id, **kwargs):
         return jsonify({'message': f'Failed to get completion time: {str(e)}'}), 500
 
 
+@analytics_bp.route('/focus', methods=['GET'])
+@token_required
+def get_focus_time(current_user_id, **kwargs):
+    """Get Pomodoro focus time per hour of day and per task"""
+    try:
+        sessions = PomodoroSession.query.filter_by(user_id=current_user_id).all()
+        
+        return jsonify({
+            'focus_time': get_focus_distribution(sessions)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get focus time: {str(e)}'}), 500
+
+
 @analytics_bp.route('/dashboard', methods=['GET'])
 @token_required
 def get_dashboard_data(current_user_id, **kwargs):
@@ -92,10 +109,14 @@ def get_dashboard_data(current_user_id, **kwargs):
     try:
         tasks = Task.query.filter_by(user_id=current_user_id).all()
         
-        stats = calculate_productivity_stats(tasks)
+        archive_summary = get_archive_summary(current_user_id)
+        
+        stats = calculate_productivity_stats(tasks, archive_summary)
+        # Archiving keeps the last MIN_ARCHIVE_AFTER_DAYS days hot, so the weekly window needs no fold-in
         weekly_data = get_weekly_productivity(tasks)
-        productive_time = get_most_productive_time(tasks)
-        avg_completion = calculate_average_completion_time(tasks)
+        productive_time = get_most_productive_time(tasks, archive_summary)
+        avg_completion = calculate_average_completion_time(tasks, archive_summary)
+        focus_time = get_focus_distribution(PomodoroSession.query.filter_by(user_id=current_user_id).all())
         
         # Calculate top categories
         category_counts = stats.get('category_counts', {})
@@ -110,6 +131,7 @@ def get_dashboard_data(current_user_id, **kwargs):
             'weekly_data': weekly_data,
             'productive_time': productive_time,
             'completion_time': avg_completion,
+            'focus_time': focus_time,
             'top_categories': [{'category': cat, 'count': count} for cat, count in top_categories]
         }), 200
     
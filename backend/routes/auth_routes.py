@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, UserRole
+from flask import Blueprint, request, jsonify, g
+from models import db, User, UserRole, UserDirectory
 from utils.auth import generate_token, generate_refresh_token, verify_token, token_required
+from utils.sharding import sharding_enabled, get_ring, id_allocator, find_user_entry, select_shard_for_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -23,13 +24,24 @@ def register():
         name = data['name'].strip()
         role = UserRole.USER  # Default role
         
-        # Check if user already exists
-        existing_user = User.query.filter_by(email=email).first()
-        if existing_user:
-            return jsonify({'message': 'User with this email already exists'}), 400
+        if sharding_enabled():
+            # Emails are only unique within a shard; the directory enforces it globally
+            if find_user_entry(email):
+                return jsonify({'message': 'User with this email already exists'}), 400
+            
+            user_id = id_allocator.allocate('users')
+            g.shard = get_ring().shard_for(user_id)
+            db.session.add(UserDirectory(user_id=user_id, email=email, shard=g.shard))
+        else:
+            # Check if user already exists
+            existing_user = User.query.filter_by(email=email).first()
+            if existing_user:
+                return jsonify({'message': 'User with this email already exists'}), 400
+            user_id = None
         
         # Create new user
         user = User(
+            id=user_id,
             name=name,
             email=email,
             role=role
@@ -67,7 +79,14 @@ def login():
         email = data['email'].lower().strip()
         password = data['password']
         
-        # Find user
+        # Find user (via the directory when sharded)
+        if sharding_enabled():
+            entry = find_user_entry(email)
+            if not entry:
+                return jsonify({'message': 'Invalid email or password'}), 401
+            if not select_shard_for_user(entry.user_id):
+                return jsonify({'message': 'Account is being migrated, please retry shortly'}), 503
+        
         user = User.query.filter_by(email=email).first()
         
         if not user or not user.check_password(password):
@@ -103,6 +122,9 @@ def refresh_token():
         if not payload or payload.get('type') != 'refresh':
             return jsonify({'message': 'Invalid refresh token'}), 401
         
+        if not select_shard_for_user(payload['user_id']):
+            return jsonify({'message': 'Account is being migrated, please retry shortly'}), 503
+        
         # Get user
         user = User.query.get(payload['user_id'])
         if not user:
@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify
+from models import PomodoroSession
+from utils.auth import token_required
+from utils.pomodoro import parse_event, get_session_buffer
+
+pomodoro_bp = Blueprint('pomodoro', __name__)
+
+# Most events accepted in one request
+MAX_EVENTS_PER_REQUEST = 100
+
+
+@pomodoro_bp.route('/events', methods=['POST'])
+@token_required
+def record_events(current_user_id, **kwargs):
+    """Accept one timer event or a batch of them ({"events": [...]})"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'No event provided'}), 400
+        
+        raw_events = data.get('events') if isinstance(data, dict) and 'events' in data else [data]
+        if not isinstance(raw_events, list) or not raw_events:
+            return jsonify({'message': 'events must be a non-empty list'}), 400
+        if len(raw_events) > MAX_EVENTS_PER_REQUEST:
+            return jsonify({'message': f'At most {MAX_EVENTS_PER_REQUEST} events per request'}), 400
+        
+        try:
+            events = [parse_event(event) for event in raw_events]
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': f'Invalid event: {str(e)}'}), 400
+        
+        # Buffered; written to the database by the next flush
+        get_session_buffer().add(current_user_id, events)
+        
+        return jsonify({
+            'message': 'Events accepted',
+            'accepted': len(events)
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to record events: {str(e)}'}), 500
+
+
+@pomodoro_bp.route('/sessions', methods=['GET'])
+@token_required
+def get_sessions(current_user_id, **kwargs):
+    """Get recorded focus sessions (the last few seconds may still be buffered)"""
+    try:
+        query = PomodoroSession.query.filter_by(user_id=current_user_id)
+        
+        task_id = request.args.get('task_id', type=int)
+        if task_id is not None:
+            query = query.filter_by(task_id=task_id)
+        
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        sessions = query.order_by(PomodoroSession.started_at.desc()).limit(limit).all()
+        
+        return jsonify({
+            'sessions': [session.to_dict() for session in sessions],
+            'count': len(sessions)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get sessions: {str(e)}'}), 500
@@ -0,0 +1,297 @@
+from flask import Blueprint, request, jsonify
+from models import db, Task, ArchivedTask, TaskSeries, TaskStatus, TaskPriority
+from utils.auth import token_required
+from utils.task_writes import bump_task_generation
+from utils.categories import add_category_usage
+from utils.recurrence import (
+    parse_rrule,
+    validate_rule,
+    iter_occurrences,
+    materialized_dates,
+    parse_window,
+    Occurrence
+)
+from datetime import datetime
+
+series_bp = Blueprint('series', __name__)
+
+RULE_FIELDS = ('frequency', 'interval', 'by_weekday', 'by_monthday', 'count', 'until')
+
+
+def _rule_from_request(data, series=None):
+    """Build recurrence fields from an `rrule` string or individual fields"""
+    if data.get('rrule'):
+        return parse_rrule(data['rrule'])
+    
+    fields = {name: getattr(series, name) for name in RULE_FIELDS} if series else {'interval': 1}
+    for name in RULE_FIELDS:
+        if name in data:
+            fields[name] = data[name]
+    if isinstance(fields.get('frequency'), str):
+        fields['frequency'] = fields['frequency'].lower()
+    for name in ('interval', 'by_monthday', 'count'):
+        if fields.get(name) is not None:
+            fields[name] = int(fields[name])
+    if isinstance(fields.get('until'), str):
+        fields['until'] = datetime.strptime(fields['until'], '%Y-%m-%d').date()
+    validate_rule(fields)
+    return fields
+
+
+@series_bp.route('/', methods=['GET'])
+@token_required
+def get_series_list(current_user_id, **kwargs):
+    """Get all recurring task series for the current user"""
+    try:
+        series_list = TaskSeries.query.filter_by(user_id=current_user_id).order_by(TaskSeries.created_at.desc()).all()
+        
+        return jsonify({
+            'series': [series.to_dict() for series in series_list],
+            'count': len(series_list)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get series: {str(e)}'}), 500
+
+
+@series_bp.route('/', methods=['POST'])
+@token_required
+def create_series(current_user_id, **kwargs):
+    """Create a recurring task series"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('title'):
+            return jsonify({'message': 'Title is required'}), 400
+        
+        try:
+            rule = _rule_from_request(data)
+            start_date = (datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+                          if data.get('start_date') else datetime.utcnow().date())
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': f'Invalid recurrence: {str(e)}'}), 400
+        
+        # Parse priority
+        priority = TaskPriority.MEDIUM
+        if data.get('priority'):
+            try:
+                priority = TaskPriority(data['priority'])
+            except ValueError:
+                pass
+        
+        series = TaskSeries(
+            user_id=current_user_id,
+            title=data['title'].strip(),
+            description=data.get('description', '').strip(),
+            category=data.get('category', '').strip() if data.get('category') else None,
+            priority=priority,
+            start_date=start_date,
+            **rule
+        )
+        
+        db.session.add(series)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Series created successfully',
+            'series': series.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to create series: {str(e)}'}), 500
+
+
+@series_bp.route('/<int:series_id>', methods=['GET'])
+@token_required
+def get_series(series_id, current_user_id, **kwargs):
+    """Get a specific series by ID"""
+    try:
+        series = TaskSeries.query.filter_by(id=series_id, user_id=current_user_id).first()
+        
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        
+        return jsonify({
+            'series': series.to_dict()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get series: {str(e)}'}), 500
+
+
+@series_bp.route('/<int:series_id>', methods=['PUT'])
+@token_required
+def update_series(series_id, current_user_id, **kwargs):
+    """Update a series; changes apply to all occurrences not yet completed"""
+    try:
+        series = TaskSeries.query.filter_by(id=series_id, user_id=current_user_id).first()
+        
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        
+        data = request.get_json() or {}
+        
+        if data.get('title'):
+            series.title = data['title'].strip()
+        
+        if 'description' in data:
+            series.description = data['description'].strip() if data['description'] else ''
+        
+        if 'category' in data:
+            series.category = data['category'].strip() if data.get('category') else None
+        
+        if data.get('priority'):
+            try:
+                series.priority = TaskPriority(data['priority'])
+            except ValueError:
+                pass
+        
+        try:
+            if data.get('start_date'):
+                series.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            if 'rrule' in data or any(name in data for name in RULE_FIELDS):
+                for name, value in _rule_from_request(data, series).items():
+                    setattr(series, name, value)
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': f'Invalid recurrence: {str(e)}'}), 400
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Series updated successfully',
+            'series': series.to_dict()
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to update series: {str(e)}'}), 500
+
+
+@series_bp.route('/<int:series_id>', methods=['DELETE'])
+@token_required
+def delete_series(series_id, current_user_id, **kwargs):
+    """Delete a series; completed occurrences are kept as standalone tasks"""
+    try:
+        series = TaskSeries.query.filter_by(id=series_id, user_id=current_user_id).first()
+        
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        
+        Task.query.filter_by(series_id=series.id, user_id=current_user_id).update(
+            {'series_id': None, 'occurrence_date': None}, synchronize_session=False
+        )
+        db.session.delete(series)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Series deleted successfully'
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to delete series: {str(e)}'}), 500
+
+
+@series_bp.route('/<int:series_id>/occurrences', methods=['GET'])
+@token_required
+def get_occurrences(series_id, current_user_id, **kwargs):
+    """List a series' occurrences in a `from`/`to` window"""
+    try:
+        series = TaskSeries.query.filter_by(id=series_id, user_id=current_user_id).first()
+        
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        
+        try:
+            window = parse_window(request.args)
+        except ValueError as e:
+            return jsonify({'message': f'Invalid window: {str(e)}'}), 400
+        if not window:
+            return jsonify({'message': 'to is required (YYYY-MM-DD)'}), 400
+        start, end = window
+        
+        tasks = {
+            task.occurrence_date: task
+            for task in Task.query.filter(
+                Task.series_id == series.id,
+                Task.occurrence_date >= start,
+                Task.occurrence_date <= end
+            )
+        }
+        archived = materialized_dates([series.id], start, end) - {(series.id, d) for d in tasks}
+        
+        occurrences = []
+        for day in iter_occurrences(series, start, end):
+            if day in tasks:
+                occurrences.append(tasks[day].to_dict())
+            elif (series.id, day) not in archived:
+                occurrences.append(Occurrence(series, day).to_dict())
+        
+        return jsonify({
+            'occurrences': occurrences,
+            'count': len(occurrences)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get occurrences: {str(e)}'}), 500
+
+
+@series_bp.route('/<int:series_id>/occurrences/<occurrence_date>/complete', methods=['PUT'])
+@token_required
+def complete_occurrence(series_id, occurrence_date, current_user_id, **kwargs):
+    """Complete one occurrence, materializing it as a task"""
+    try:
+        series = TaskSeries.query.filter_by(id=series_id, user_id=current_user_id).first()
+        
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        
+        try:
+            day = datetime.strptime(occurrence_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if day not in iter_occurrences(series, day, day):
+            return jsonify({'message': 'Date is not an occurrence of this series'}), 404
+        
+        # Archived occurrences count too, or completing one again would re-materialize it
+        if (series.id, day) in materialized_dates([series.id], day, day):
+            # Already materialized; further changes go through the task endpoints
+            existing = (
+                Task.query.filter_by(series_id=series.id, occurrence_date=day).first()
+                or ArchivedTask.query.filter_by(series_id=series.id, occurrence_date=day).first()
+            )
+            return jsonify({
+                'message': 'Occurrence already recorded',
+                'task': existing.to_dict()
+            }), 200
+        
+        now = datetime.utcnow()
+        task = Task(
+            user_id=current_user_id,
+            title=series.title,
+            description=series.description,
+            category=series.category,
+            priority=series.priority,
+            deadline=day,
+            status=TaskStatus.COMPLETED,
+            created_at=now,
+            completed_at=now,
+            series_id=series.id,
+            occurrence_date=day
+        )
+        
+        db.session.add(task)
+        add_category_usage(current_user_id, task.category)
+        bump_task_generation(current_user_id)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Occurrence completed successfully',
+            'task': task.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to complete occurrence: {str(e)}'}), 500
@@ -1,63 +1,127 @@
 from flask import Blueprint, request, jsonify
-from models import db, Task, TaskStatus, TaskPriority
+from models import db, Task, TaskStatus, TaskPriority, ArchivedTask
 from utils.auth import token_required
-from datetime import datetime
+from utils.task_writes import (
+    conditional_update,
+    toggle_values,
+    status_values,
+    parse_if_match,
+    etag_for,
+    bump_task_generation,
+    StaleVersionError
+)
+from utils.facets import get_facets
+from utils.categories import add_category_usage, release_task_category, category_index, DEFAULT_SUGGESTIONS
+from utils.ranking import parse_weights, top_pending_tasks
+from datetime import datetime, timedelta
+from utils.recurrence import MAX_WINDOW_DAYS, expand_occurrences, parse_window
+import heapq
 
 task_bp = Blueprint('tasks', __name__)
 
 
+def _filtered_query(model, current_user_id, status, category, priority, search, sort_by, sort_order):
+    """Build a filtered, sorted query against Task or ArchivedTask"""
+    query = model.query.filter_by(user_id=current_user_id)
+    
+    # Apply filters
+    if status:
+        try:
+            task_status = TaskStatus(status)
+            query = query.filter_by(status=task_status)
+        except ValueError:
+            pass
+    
+    if category:
+        query = query.filter_by(category=category)
+    
+    if priority:
+        try:
+            task_priority = TaskPriority(priority)
+            query = query.filter_by(priority=task_priority)
+        except ValueError:
+            pass
+    
+    if search:
+        search_term = f'%{search}%'
+        query = query.filter(
+            db.or_(
+                model.title.like(search_term),
+                model.description.like(search_term)
+            )
+        )
+    
+    # Apply sorting
+    if hasattr(Task, sort_by) and hasattr(model, sort_by):
+        sort_column = getattr(model, sort_by)
+        if sort_order.lower() == 'asc':
+            query = query.order_by(sort_column.asc())
+        else:
+            query = query.order_by(sort_column.desc())
+    
+    return query
+
+
+def _sort_key(sort_by):
+    """Python sort key matching the SQL ORDER BY on `sort_by`"""
+    def sort_key(task):
+        value = getattr(task, sort_by, None)
+        # Enums compare by value; NULLs sort first like SQLite/MySQL ascending
+        value = value.value if hasattr(value, 'value') else value
+        return (value is not None, value)
+    return sort_key
+
+
+def _merge_sorted(sort_by, sort_order, *lists):
+    """Merge lists already sorted by the same column"""
+    if not hasattr(Task, sort_by):
+        return [task for tasks in lists for task in tasks]
+    
+    return list(heapq.merge(*lists, key=_sort_key(sort_by), reverse=sort_order.lower() != 'asc'))
+
+
 @task_bp.route('/', methods=['GET'])
 @token_required
 def get_tasks(current_user_id, **kwargs):
     """Get all tasks for the current user with filtering"""
     try:
         # Get query parameters
-        status = request.args.get('status')
-        category = request.args.get('category')
-        priority = request.args.get('priority')
-        search = request.args.get('search')
-        sort_by = request.args.get('sort_by', 'created_at')
-        sort_order = request.args.get('sort_order', 'desc')
-        
-        # Base query
-        query = Task.query.filter_by(user_id=current_user_id)
-        
-        # Apply filters
-        if status:
-            try:
-                task_status = TaskStatus(status)
-                query = query.filter_by(status=task_status)
-            except ValueError:
-                pass
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        if priority:
-            try:
-                task_priority = TaskPriority(priority)
-                query = query.filter_by(priority=task_priority)
-            except ValueError:
-                pass
-        
-        if search:
-            search_term = f'%{search}%'
-            query = query.filter(
-                db.or_(
-                    Task.title.like(search_term),
-                    Task.description.like(search_term)
-                )
+        filters = {
+            'status': request.args.get('status'),
+            'category': request.args.get('category'),
+            'priority': request.args.get('priority'),
+            'search': request.args.get('search'),
+            'sort_by': request.args.get('sort_by', 'created_at'),
+            'sort_order': request.args.get('sort_order', 'desc')
+        }
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+        try:
+            # Recurring series are expanded only for an explicit from/to window
+            window = parse_window(request.args)
+        except ValueError as e:
+            return jsonify({'message': f'Invalid window: {str(e)}'}), 400
+        
+        # Only the hot table is read unless archived tasks are asked for
+        tasks = _filtered_query(Task, current_user_id, **filters).all()
+        lists = [tasks]
+        
+        if include_archived:
+            lists.append(_filtered_query(ArchivedTask, current_user_id, **filters).all())
+        
+        if window and filters['status'] in (None, '', TaskStatus.PENDING.value):
+            occurrences = expand_occurrences(
+                current_user_id, *window,
+                category=filters['category'],
+                priority=filters['priority'],
+                search=filters['search']
             )
+            if hasattr(Task, filters['sort_by']):
+                occurrences.sort(key=_sort_key(filters['sort_by']),
+                                 reverse=filters['sort_order'].lower() != 'asc')
+            lists.append(occurrences)
         
-        # Apply sorting
-        if hasattr(Task, sort_by):
-            sort_column = getattr(Task, sort_by)
-            if sort_order.lower() == 'asc':
-                query = query.order_by(sort_column.asc())
-            else:
-                query = query.order_by(sort_column.desc())
-        
-        tasks = query.all()
+        if len(lists) > 1:
+            tasks = _merge_sorted(filters['sort_by'], filters['sort_order'], *lists)
         
         return jsonify({
             'tasks': [task.to_dict() for task in tasks],
@@ -68,6 +132,108 @@ def get_tasks(current_user_id, **kwargs):
         return jsonify({'message': f'Failed to get tasks: {str(e)}'}), 500
 
 
+@task_bp.route('/due', methods=['GET'])
+@token_required
+def get_due_tasks(current_user_id, **kwargs):
+    """Get pending tasks that are overdue or due within `days` days"""
+    try:
+        try:
+            days = max(0, int(request.args.get('days', 0)))
+        except ValueError:
+            return jsonify({'message': 'days must be an integer'}), 400
+        if days > MAX_WINDOW_DAYS:
+            return jsonify({'message': f'days may be at most {MAX_WINDOW_DAYS}'}), 400
+        
+        today = datetime.utcnow().date()
+        # Range scan on the (user_id, status, deadline) index
+        tasks = Task.query.filter(
+            Task.user_id == current_user_id,
+            Task.status == TaskStatus.PENDING,
+            Task.deadline <= today + timedelta(days=days)
+        ).order_by(Task.deadline.asc(), Task.id.asc()).all()
+        
+        overdue = [t.to_dict() for t in tasks if t.deadline < today]
+        due = [t for t in tasks if t.deadline >= today]
+        
+        # Upcoming occurrences of recurring series, expanded for this window only;
+        # missed occurrences are treated as skipped rather than overdue
+        due.extend(expand_occurrences(current_user_id, today, today + timedelta(days=days)))
+        due.sort(key=lambda t: (t.deadline, t.id is None, t.id or 0))
+        
+        return jsonify({
+            'overdue': overdue,
+            'due': [t.to_dict() for t in due],
+            'count': len(overdue) + len(due)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get due tasks: {str(e)}'}), 500
+
+
+@task_bp.route('/next', methods=['GET'])
+@token_required
+def get_next_tasks(current_user_id, **kwargs):
+    """Get the top `limit` pending tasks ranked by priority, deadline, age and category"""
+    try:
+        try:
+            limit = min(max(1, int(request.args.get('limit', 5))), 50)
+            weights = parse_weights(request.args)
+        except ValueError as e:
+            return jsonify({'message': f'Invalid ranking parameters: {str(e)}'}), 400
+        
+        ranked = top_pending_tasks(current_user_id, limit, weights)
+        
+        return jsonify({
+            'tasks': [dict(task.to_dict(), score=round(score, 3)) for score, task in ranked],
+            'count': len(ranked),
+            'weights': weights
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get next tasks: {str(e)}'}), 500
+
+
+@task_bp.route('/facets', methods=['GET'])
+@token_required
+def get_task_facets(current_user_id, **kwargs):
+    """Get status/priority/category counts under the current filters and search"""
+    try:
+        facets = get_facets(
+            current_user_id,
+            status=request.args.get('status'),
+            priority=request.args.get('priority'),
+            category=request.args.get('category'),
+            search=request.args.get('search'),
+            include_archived=request.args.get('include_archived', 'false').lower() == 'true'
+        )
+        
+        return jsonify(facets), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get facets: {str(e)}'}), 500
+
+
+@task_bp.route('/categories', methods=['GET'])
+@token_required
+def get_categories(current_user_id, **kwargs):
+    """Suggest the user's most used categories starting with `prefix`"""
+    try:
+        try:
+            limit = min(max(1, int(request.args.get('limit', DEFAULT_SUGGESTIONS))), 50)
+        except ValueError:
+            return jsonify({'message': 'limit must be an integer'}), 400
+        
+        categories = category_index.suggest(current_user_id, request.args.get('prefix', '').strip(), limit)
+        
+        return jsonify({
+            'categories': categories,
+            'count': len(categories)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to get categories: {str(e)}'}), 500
+
+
 @task_bp.route('/<int:task_id>', methods=['GET'])
 @token_required
 def get_task(task_id, current_user_id, **kwargs):
@@ -80,7 +246,7 @@ def get_task(task_id, current_user_id, **kwargs):
         
         return jsonify({
             'task': task.to_dict()
-        }), 200
+        }), 200, {'ETag': etag_for(task)}
     
     except Exception as e:
         return jsonify({'message': f'Failed to get task: {str(e)}'}), 500
@@ -124,12 +290,14 @@ def create_task(current_user_id, **kwargs):
         )
         
         db.session.add(task)
+        add_category_usage(current_user_id, task.category)
+        bump_task_generation(current_user_id)
         db.session.commit()
         
         return jsonify({
             'message': 'Task created successfully',
             'task': task.to_dict()
-        }), 201
+        }), 201, {'ETag': etag_for(task)}
     
     except Exception as e:
         db.session.rollback()
@@ -141,55 +309,62 @@ def create_task(current_user_id, **kwargs):
 def update_task(task_id, current_user_id, **kwargs):
     """Update an existing task"""
     try:
-        task = Task.query.filter_by(id=task_id, user_id=current_user_id).first()
+        try:
+            expected_version = parse_if_match(request.headers.get('If-Match'))
+        except ValueError:
+            return jsonify({'message': 'Invalid If-Match header'}), 400
         
-        if not task:
-            return jsonify({'message': 'Task not found'}), 404
-        
-        data = request.get_json()
+        data = request.get_json() or {}
+        values = []
+        new_category = None
         
         # Update fields
         if data.get('title'):
-            task.title = data['title'].strip()
+            values.append((Task.title, data['title'].strip()))
         
         if 'description' in data:
-            task.description = data['description'].strip() if data['description'] else ''
+            values.append((Task.description, data['description'].strip() if data['description'] else ''))
         
         if 'category' in data:
-            task.category = data['category'].strip() if data.get('category') else None
+            new_category = data['category'].strip() if data.get('category') else None
+            values.append((Task.category, new_category))
         
         if data.get('priority'):
             try:
-                task.priority = TaskPriority(data['priority'])
+                values.append((Task.priority, TaskPriority(data['priority'])))
             except ValueError:
                 pass
         
         if data.get('deadline'):
             try:
-                task.deadline = datetime.strptime(data['deadline'], '%Y-%m-%d').date()
+                values.append((Task.deadline, datetime.strptime(data['deadline'], '%Y-%m-%d').date()))
             except ValueError:
                 return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
         if data.get('status'):
             try:
-                new_status = TaskStatus(data['status'])
                 # Set/clear completion timestamp when status changes
-                if task.status != new_status:
-                    task.status = new_status
-                    if new_status == TaskStatus.COMPLETED:
-                        task.completed_at = datetime.utcnow()
-                    else:
-                        task.completed_at = None
+                values.extend(status_values(TaskStatus(data['status']), datetime.utcnow()))
             except ValueError:
                 pass
         
-        task.updated_at = datetime.utcnow()
-        db.session.commit()
+        if 'category' in data:
+            # Move the usage count in the same transaction as the update
+            release_task_category(task_id, current_user_id)
+            add_category_usage(current_user_id, new_category)
+        
+        task = conditional_update(task_id, current_user_id, values, expected_version)
+        
+        if not task:
+            return jsonify({'message': 'Task not found'}), 404
         
         return jsonify({
             'message': 'Task updated successfully',
             'task': task.to_dict()
-        }), 200
+        }), 200, {'ETag': etag_for(task)}
+    
+    except StaleVersionError as e:
+        return jsonify({'message': str(e), 'current_version': e.current_version}), 412
     
     except Exception as e:
         db.session.rollback()
@@ -207,6 +382,8 @@ def delete_task(task_id, current_user_id, **kwargs):
             return jsonify({'message': 'Task not found'}), 404
         
         db.session.delete(task)
+        add_category_usage(current_user_id, task.category, -1)
+        bump_task_generation(current_user_id)
         db.session.commit()
         
         return jsonify({
@@ -223,28 +400,25 @@ def delete_task(task_id, current_user_id, **kwargs):
 def toggle_task_complete(task_id, current_user_id, **kwargs):
     """Toggle task completion status"""
     try:
-        task = Task.query.filter_by(id=task_id, user_id=current_user_id).first()
+        try:
+            expected_version = parse_if_match(request.headers.get('If-Match'))
+        except ValueError:
+            return jsonify({'message': 'Invalid If-Match header'}), 400
+        
+        # Toggle status and manage completed_at in a single UPDATE
+        task = conditional_update(task_id, current_user_id, toggle_values(datetime.utcnow()), expected_version)
         
         if not task:
             return jsonify({'message': 'Task not found'}), 404
         
-        # Toggle status and manage completed_at
-        if task.status == TaskStatus.PENDING:
-            task.status = TaskStatus.COMPLETED
-            task.completed_at = datetime.utcnow()
-        else:
-            task.status = TaskStatus.PENDING
-            task.completed_at = None
-        
-        task.updated_at = datetime.utcnow()
-        db.session.commit()
-        
         return jsonify({
             'message': 'Task status updated successfully',
             'task': task.to_dict()
-        }), 200
+        }), 200, {'ETag': etag_for(task)}
+    
+    except StaleVersionError as e:
+        return jsonify({'message': str(e), 'current_version': e.current_version}), 412
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Failed to update task status: {str(e)}'}), 500
-
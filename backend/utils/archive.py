@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from sqlalchemy import insert, select, delete, func
+from models import db, Task, TaskStatus, ArchivedTask, ArchiveSummary
+from utils.task_writes import bump_task_generation
+
+# /api/analytics/weekly only reads hot tasks, so nothing younger than its
+# window may be archived
+MIN_ARCHIVE_AFTER_DAYS = 7
+
+# Columns copied verbatim from tasks into archived_tasks
+ARCHIVE_COLUMNS = [
+    'id', 'user_id', 'title', 'description', 'category', 'priority',
+    'deadline', 'status', 'created_at', 'updated_at', 'completed_at', 'version',
+    'series_id', 'occurrence_date'
+]
+
+
+def _summarize_batch(tasks):
+    """Aggregate a batch of completed tasks into per-user summary deltas"""
+    deltas = defaultdict(lambda: {
+        'total_tasks': 0,
+        'category_counts': defaultdict(int),
+        'priority_counts': defaultdict(int),
+        'day_counts': defaultdict(int),
+        'hour_counts': defaultdict(int),
+        'completion_seconds': 0.0,
+        'completion_samples': 0
+    })
+
+    for task in tasks:
+        delta = deltas[task.user_id]
+        delta['total_tasks'] += 1
+        if task.category:
+            delta['category_counts'][task.category] += 1
+        delta['priority_counts'][task.priority.value] += 1
+
+        reference_dt = task.completed_at or task.updated_at or task.created_at
+        delta['day_counts'][reference_dt.strftime('%A')] += 1
+        delta['hour_counts'][str(reference_dt.hour)] += 1
+
+        reference_completion = task.completed_at or task.updated_at
+        if reference_completion and task.created_at:
+            time_diff = reference_completion - task.created_at
+            if time_diff.days < 30:
+                delta['completion_seconds'] += time_diff.total_seconds()
+                delta['completion_samples'] += 1
+
+    return deltas
+
+
+def _merge_counts(current, delta):
+    """Return a new dict with delta counts added to current ones"""
+    merged = dict(current or {})
+    for key, count in delta.items():
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+def _apply_summary_deltas(deltas):
+    """Fold batch deltas into the stored archive summaries"""
+    for user_id, delta in deltas.items():
+        summary = db.session.get(ArchiveSummary, user_id)
+        if not summary:
+            summary = ArchiveSummary(user_id=user_id, total_tasks=0,
+                                     completion_seconds=0.0, completion_samples=0)
+            db.session.add(summary)
+
+        summary.total_tasks += delta['total_tasks']
+        # Reassign JSON columns so the change is picked up by the session
+        for field in ('category_counts', 'priority_counts', 'day_counts', 'hour_counts'):
+            setattr(summary, field, _merge_counts(getattr(summary, field), delta[field]))
+        summary.completion_seconds += delta['completion_seconds']
+        summary.completion_samples += delta['completion_samples']
+
+
+def archive_completed_tasks(older_than_days=90, batch_size=500, max_batches=None):
+    """Move tasks completed more than `older_than_days` ago into archived_tasks.
+
+    Work is done in small batches, each in its own short transaction, so
+    writers on the hot table are never locked out for long. Returns the
+    number of tasks archived.
+    """
+    if older_than_days < MIN_ARCHIVE_AFTER_DAYS:
+        raise ValueError(f'Tasks may only be archived after at least {MIN_ARCHIVE_AFTER_DAYS} days')
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    # Tasks completed before completed_at existed fall back to updated_at, as in analytics
+    completed_at = func.coalesce(Task.completed_at, Task.updated_at)
+    archived = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        tasks = (
+            Task.query
+            .filter(Task.status == TaskStatus.COMPLETED, completed_at < cutoff)
+            .order_by(completed_at.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not tasks:
+            break
+
+        ids = [t.id for t in tasks]
+        # The batch was read without locks, so a task may have been reopened
+        # since: both statements check the archiving conditions again
+        still_archivable = (
+            Task.id.in_(ids),
+            Task.status == TaskStatus.COMPLETED,
+            completed_at < cutoff,
+        )
+        try:
+            columns = [getattr(Task, name) for name in ARCHIVE_COLUMNS]
+            db.session.execute(
+                insert(ArchivedTask).from_select(
+                    ARCHIVE_COLUMNS,
+                    select(*columns).where(*still_archivable)
+                )
+            )
+            # Summarize what was actually copied, not the stale batch
+            copied = ArchivedTask.query.filter(ArchivedTask.id.in_(ids)).all()
+            _apply_summary_deltas(_summarize_batch(copied))
+            db.session.execute(delete(Task).where(*still_archivable))
+            bump_task_generation(*{t.user_id for t in copied})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Drop the moved objects so the identity map stays small
+        db.session.expunge_all()
+        archived += len(copied)
+        batches += 1
+
+    return archived
+
+
+def get_archive_summary(user_id):
+    """Get the archive summary for a user, or None if nothing is archived"""
+    return db.session.get(ArchiveSummary, user_id)
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from flask import current_app
 from functools import wraps
 from flask import jsonify, request
+from utils.sharding import select_shard_for_user
 
 
 def generate_token(user_id, email, role):
@@ -62,6 +63,10 @@ def token_required(f):
         if not payload:
             return jsonify({'message': 'Token is invalid or expired'}), 401
         
+        # Route this request's queries to the user's shard (no-op when unsharded)
+        if not select_shard_for_user(payload['user_id']):
+            return jsonify({'message': 'Account is being migrated, please retry shortly'}), 503
+        
         # Add user info to kwargs for route handlers
         kwargs['current_user_id'] = payload['user_id']
         kwargs['current_user_role'] = payload.get('role', 'user')
@@ -0,0 +1,327 @@
+"""Online backups of SQLite databases.
+
+The app runs SQLite in WAL mode (see init_app), where a reader sees one
+consistent snapshot and never blocks writers. A backup then copies the
+whole database in a single step of SQLite's backup API
+(sqlite3.Connection.backup): one read transaction, so the snapshot is
+consistent and writers carry on while it runs.
+
+Databases still in rollback-journal mode (SQLITE_WAL=false, or files
+opened by other tools) fall back to the incremental path: a few pages are
+copied per step and the source is only locked while a step runs, so writers
+wait for at most one step between pauses. A write from another connection
+makes SQLite restart the copy, and if writers keep that up the step size
+grows until the file is copied in one step, which blocks writers for the
+whole copy. Incremental mode therefore only bounds writer stalls on a
+database that is quiet enough for a copy to finish; under steady writes it
+ends up as one long stall.
+
+Each snapshot is integrity-checked and gzip-compressed into
+``<database>-<path hash>/<database>-<UTC timestamp>.db.gz``: one folder per
+source file, so databases with similar or equal names never rotate each
+other's snapshots. The oldest snapshots beyond ``keep`` are deleted.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Step size is multiplied by this after `max_restarts` restarts of one attempt
+STEP_GROWTH = 8
+
+# Only one backup runs at a time per process
+_backup_lock = threading.Lock()
+
+
+class BackupInProgress(Exception):
+    """Raised when a backup is requested while another one is running"""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def sqlite_path(engine):
+    """File path of an SQLite engine's database, or None for other databases"""
+    if engine.url.get_backend_name() != 'sqlite':
+        return None
+    database = engine.url.database
+    if not database or database == ':memory:':
+        return None
+    return os.path.abspath(database)
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def init_app(app):
+    """Put the app's SQLite databases in WAL mode unless SQLITE_WAL is off"""
+    if not app.config['SQLITE_WAL']:
+        return
+    from sqlalchemy import event
+    from models import db
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if sqlite_path(engine):
+            event.listen(engine, 'connect', _enable_wal)
+
+
+def journal_mode(path):
+    """Journal mode of an SQLite database file ('wal', 'delete', ...)"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def integrity_check(path):
+    """Run PRAGMA integrity_check on an uncompressed database file"""
+    conn = sqlite3.connect(path)
+    try:
+        result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    except sqlite3.DatabaseError:
+        # Not a database at all
+        return False
+    finally:
+        conn.close()
+    return result == ['ok']
+
+
+def _stem(source):
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def source_dir(dest_dir, source):
+    """Folder holding the snapshots of the database file `source`"""
+    digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(dest_dir, f'{_stem(source)}-{digest}')
+
+
+def list_backups(dest_dir, source=None):
+    """Backup files of `source` (or of every database) in `dest_dir`, newest first"""
+    if source:
+        folders = [source_dir(dest_dir, source)]
+    elif os.path.isdir(dest_dir):
+        folders = [entry.path for entry in os.scandir(dest_dir) if entry.is_dir()]
+    else:
+        folders = []
+    paths = [
+        os.path.join(folder, name)
+        for folder in folders if os.path.isdir(folder)
+        for name in os.listdir(folder) if name.endswith('.db.gz')
+    ]
+    # Timestamps sort lexically, so they give age order
+    paths.sort(key=lambda path: path.rsplit('-', 1)[-1], reverse=True)
+    return paths
+
+
+def rotate_backups(dest_dir, source, keep):
+    """Delete all but the newest `keep` backups of `source`; returns deleted paths"""
+    stale = list_backups(dest_dir, source)[keep:]
+    for path in stale:
+        os.remove(path)
+    return stale
+
+
+def verify_backup(path):
+    """Decompress a .db.gz backup to a temp file and integrity-check it"""
+    fd, tmp = tempfile.mkstemp(suffix='.db')
+    try:
+        with os.fdopen(fd, 'wb') as out, gzip.open(path, 'rb') as src:
+            shutil.copyfileobj(src, out)
+        return integrity_check(tmp)
+    finally:
+        os.remove(tmp)
+
+
+def _copy(source, tmp, pages, step_sleep, max_restarts, stats):
+    """One backup attempt into `tmp`; returns the page count"""
+    last_remaining = None
+    attempt_restarts = 0
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining, attempt_restarts
+        stats['steps'] += 1
+        stats['total'] = total
+        if last_remaining is not None and remaining > last_remaining:
+            # The source changed under us and SQLite started over
+            stats['restarts'] += 1
+            attempt_restarts += 1
+            if attempt_restarts > max_restarts:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if remaining and step_sleep:
+            # Give writers waiting on the source a turn before the next step
+            time.sleep(step_sleep)
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst, pages=pages, progress=progress)
+        # The copy inherits WAL mode; make the snapshot a self-contained file
+        dst.execute('PRAGMA journal_mode=DELETE')
+        return dst.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def backup_database(source, dest_dir, pages_per_step=100, step_sleep=0.005, keep=7, compress_level=6,
+                    max_restarts=3):
+    """Take an online backup of the SQLite file `source` into `dest_dir`.
+
+    `pages_per_step`, `step_sleep` and `max_restarts` only apply to databases
+    in rollback-journal mode; WAL databases are copied in one step.
+    Returns a dict describing the snapshot. Raises RuntimeError if the copy
+    fails its integrity check (the bad copy is discarded).
+    """
+    folder = source_dir(dest_dir, source)
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+    final = os.path.join(folder, f'{_stem(source)}-{stamp}.db.gz')
+    tmp = final[:-len('.gz')] + '.tmp'
+    stats = {'steps': 0, 'restarts': 0}
+
+    started = time.perf_counter()
+    try:
+        mode = journal_mode(source)
+        # In WAL mode one step reads a single snapshot without blocking writers,
+        # while stepping would only let every write restart the copy
+        pages = -1 if mode == 'wal' else pages_per_step
+        while True:
+            try:
+                page_count = _copy(source, tmp, pages, step_sleep, max_restarts, stats)
+                break
+            except _TooManyRestarts:
+                # Writers keep changing the source: copy bigger chunks, finally all at once
+                pages = -1 if pages * STEP_GROWTH >= stats['total'] else pages * STEP_GROWTH
+        copy_seconds = time.perf_counter() - started
+
+        if not integrity_check(tmp):
+            raise RuntimeError(f'Backup of {source} failed its integrity check')
+        size = os.path.getsize(tmp)
+        with open(tmp, 'rb') as raw, gzip.open(final, 'wb', compresslevel=compress_level) as out:
+            shutil.copyfileobj(raw, out)
+    except Exception:
+        if os.path.exists(final):
+            os.remove(final)
+        raise
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return {
+        'source': source,
+        'path': final,
+        'pages': page_count,
+        'journal_mode': mode,
+        'pages_per_step': pages,
+        'steps': stats['steps'],
+        'restarts': stats['restarts'],
+        'size_bytes': size,
+        'compressed_bytes': os.path.getsize(final),
+        'copy_seconds': round(copy_seconds, 3),
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'rotated': rotate_backups(dest_dir, source, keep),
+    }
+
+
+def _backup_sources(engines, dest_dir, **options):
+    sources = []
+    for engine in engines:
+        path = sqlite_path(engine)
+        if path and path not in sources:
+            sources.append(path)
+    return [backup_database(path, dest_dir, **options) for path in sources]
+
+
+def backup_all(engines, dest_dir, **options):
+    """Back up every SQLite database among `engines` (default database and shards).
+
+    Raises BackupInProgress if a backup is already running in this process.
+    """
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupInProgress('A backup is already running')
+    try:
+        return _backup_sources(engines, dest_dir, **options)
+    finally:
+        _backup_lock.release()
+
+
+def backup_dir(app, engine):
+    """Configured BACKUP_DIR, or a backups/ folder next to the database"""
+    if app.config.get('BACKUP_DIR'):
+        return app.config['BACKUP_DIR']
+    path = sqlite_path(engine)
+    return os.path.join(os.path.dirname(path), 'backups') if path else None
+
+
+def _config_options(config):
+    return {
+        'pages_per_step': config['BACKUP_PAGES_PER_STEP'],
+        'step_sleep': config['BACKUP_STEP_SLEEP'],
+        'keep': config['BACKUP_KEEP'],
+    }
+
+
+def backup_from_config():
+    """Back up the current app's SQLite databases using the BACKUP_* settings"""
+    from flask import current_app
+    from models import db
+    dest_dir = backup_dir(current_app, db.engine)
+    if not dest_dir:
+        return []
+    return backup_all(db.engines.values(), dest_dir, **_config_options(current_app.config))
+
+
+def start_backup(app):
+    """Back up the app's SQLite databases in a background thread.
+
+    Returns False if there is no SQLite database to back up; raises
+    BackupInProgress if a backup is already running in this process. The
+    outcome is kept in app.extensions['last_backup'].
+    """
+    from models import db
+    with app.app_context():
+        engines = list(db.engines.values())
+        dest_dir = backup_dir(app, db.engine)
+    if not dest_dir or not any(sqlite_path(engine) for engine in engines):
+        return False
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupInProgress('A backup is already running')
+
+    def run():
+        started_at = f"{datetime.utcnow().isoformat()}Z"
+        try:
+            results = _backup_sources(engines, dest_dir, **_config_options(app.config))
+            app.extensions['last_backup'] = {'started_at': started_at, 'backups': results}
+        except Exception as e:
+            logger.exception('Background backup failed')
+            app.extensions['last_backup'] = {'started_at': started_at, 'error': str(e)}
+        finally:
+            _backup_lock.release()
+
+    try:
+        threading.Thread(target=run, name='backup', daemon=True).start()
+    except Exception:
+        _backup_lock.release()
+        raise
+    return True
+
+
+def backup_running():
+    """Whether a backup is running in this process"""
+    return _backup_lock.locked()
@@ -0,0 +1,149 @@
+"""Per-user category dictionary for autocomplete.
+
+task_categories holds how many of a user's tasks (hot or archived) use each
+category. Task writes adjust it in their own transaction, so it never needs
+a scan of the tasks table. Suggestions are served from an in-memory prefix
+index: a sorted list of lower-cased names per user, searched with bisect.
+The index is rebuilt from task_categories when the user's
+category_generation changes, which only happens when a count does (not on
+toggles or title edits), and indexes of users not seen lately are evicted
+(LRU).
+"""
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from sqlalchemy import select, update, delete, func, union_all
+from models import db, User, Task, ArchivedTask, TaskCategory
+
+# Users whose prefix index is kept in memory, per process
+CATEGORY_INDEX_USERS = 1000
+DEFAULT_SUGGESTIONS = 10
+
+
+def _bump_category_generation(user_id):
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(category_generation=User.category_generation + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_category_generation(user_id):
+    """Current category generation of a user (a primary key lookup)"""
+    return db.session.scalar(select(User.category_generation).where(User.id == user_id)) or 0
+
+
+def add_category_usage(user_id, name, delta=1):
+    """Adjust a category's usage count, in the caller's transaction"""
+    if not name:
+        return
+    _bump_category_generation(user_id)
+    result = db.session.execute(
+        update(TaskCategory)
+        .where(TaskCategory.user_id == user_id, TaskCategory.name == name)
+        .values(usage_count=TaskCategory.usage_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0 and delta > 0:
+        db.session.add(TaskCategory(user_id=user_id, name=name, usage_count=delta))
+
+
+def release_task_category(task_id, user_id):
+    """Decrement the category a task currently has, read inside the same UPDATE.
+
+    Used before a task's category is overwritten: the old value never has to
+    be fetched, and a rolled-back task update rolls this back too.
+    """
+    current = select(Task.category).where(Task.id == task_id, Task.user_id == user_id).scalar_subquery()
+    result = db.session.execute(
+        update(TaskCategory)
+        .where(TaskCategory.user_id == user_id, TaskCategory.name == current)
+        .values(usage_count=TaskCategory.usage_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        _bump_category_generation(user_id)
+
+
+def rebuild_category_counts():
+    """Recompute task_categories from tasks and archived tasks (current shard).
+
+    Only needed once for databases that predate the dictionary. Returns
+    the number of categories written.
+    """
+    source = union_all(
+        select(Task.user_id, Task.category).where(Task.category.isnot(None)),
+        select(ArchivedTask.user_id, ArchivedTask.category).where(ArchivedTask.category.isnot(None))
+    ).subquery()
+    rows = db.session.execute(
+        select(source.c.user_id, source.c.category, func.count())
+        .group_by(source.c.user_id, source.c.category)
+    ).all()
+    db.session.execute(delete(TaskCategory))
+    # Added as objects so ids come from the allocator, as for any other row
+    db.session.add_all([
+        TaskCategory(user_id=user_id, name=name, usage_count=count) for user_id, name, count in rows
+    ])
+    # Invalidate every cached index on this shard
+    db.session.execute(
+        update(User).values(category_generation=User.category_generation + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return len(rows)
+
+
+class _UserIndex:
+    """One user's categories sorted by lower-cased name"""
+
+    def __init__(self, generation, categories):
+        self.generation = generation
+        entries = sorted((name.lower(), name, count) for name, count in categories if count > 0)
+        self.keys = [key for key, _, _ in entries]
+        self.entries = entries
+
+    def top(self, prefix, limit):
+        prefix = prefix.lower()
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_right(self.keys, prefix + '\U0010ffff', lo)
+        # Most used first, then alphabetical; never sorts the whole range
+        best = heapq.nsmallest(limit, range(lo, hi), key=lambda i: (-self.entries[i][2], self.keys[i]))
+        return [{'name': self.entries[i][1], 'count': self.entries[i][2]} for i in best]
+
+
+class CategoryIndex:
+    """LRU of per-user prefix indexes, validated against category_generation"""
+
+    def __init__(self, max_users=CATEGORY_INDEX_USERS):
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, user_id, generation):
+        rows = db.session.execute(
+            select(TaskCategory.name, TaskCategory.usage_count).where(TaskCategory.user_id == user_id)
+        ).all()
+        return _UserIndex(generation, rows)
+
+    def suggest(self, user_id, prefix='', limit=DEFAULT_SUGGESTIONS):
+        """Top `limit` categories starting with `prefix` (case-insensitive)"""
+        generation = get_category_generation(user_id)
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+
+        if index is None or index.generation != generation:
+            index = self._load(user_id, generation)
+            with self._lock:
+                self._users[user_id] = index
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+        return index.top(prefix or '', limit)
+
+
+category_index = CategoryIndex()
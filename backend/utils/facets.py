@@ -0,0 +1,107 @@
+"""Faceted counts for the task filter bar.
+
+One grouped query over (status, priority, category) returns every
+combination under the current search, served from the
+idx_tasks_user_facets index. Each facet is then folded in Python with the
+*other* facets' filters applied, so choosing a status still shows how many
+tasks the other statuses have.
+
+Results are cached per process, keyed by the user's task_generation. Every
+task write bumps it in its own transaction (see bump_task_generation), so a
+cached entry is never served after the data it describes has changed, even
+when the write happened in another worker.
+"""
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, func, union_all
+from models import db, User, Task, ArchivedTask, TaskStatus, TaskPriority
+
+# Cached facet results kept per process, across all users
+FACET_CACHE_SIZE = 1024
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_task_generation(user_id):
+    """Current task generation of a user (a primary key lookup)"""
+    return db.session.scalar(select(User.task_generation).where(User.id == user_id)) or 0
+
+
+def _grouped_counts(user_id, search, include_archived):
+    """(status, priority, category, count) rows for a user's tasks matching `search`"""
+    def matching(model):
+        stmt = select(model.status, model.priority, model.category).where(model.user_id == user_id)
+        if search:
+            search_term = f'%{search}%'
+            stmt = stmt.where(db.or_(model.title.like(search_term), model.description.like(search_term)))
+        return stmt
+
+    if include_archived:
+        source = union_all(matching(Task), matching(ArchivedTask)).subquery()
+        columns = (source.c.status, source.c.priority, source.c.category)
+        stmt = select(*columns, func.count()).group_by(*columns)
+    else:
+        stmt = matching(Task).add_columns(func.count()).group_by(Task.status, Task.priority, Task.category)
+    return db.session.execute(stmt).all()
+
+
+def _fold(rows, status, priority, category):
+    """Turn grouped rows into per-facet counts under the selected filters"""
+    facets = {
+        'status': {s.value: 0 for s in TaskStatus},
+        'priority': {p.value: 0 for p in TaskPriority},
+        # Every category the search matches is listed, even if the other filters leave it empty
+        'category': {}
+    }
+    total = 0
+
+    for row_status, row_priority, row_category, count in rows:
+        row_status, row_priority = row_status.value, row_priority.value
+        status_ok = not status or row_status == status
+        priority_ok = not priority or row_priority == priority
+        category_ok = not category or row_category == category
+
+        if priority_ok and category_ok:
+            facets['status'][row_status] += count
+        if status_ok and category_ok:
+            facets['priority'][row_priority] += count
+        if row_category:
+            facets['category'].setdefault(row_category, 0)
+            if status_ok and priority_ok:
+                facets['category'][row_category] += count
+        if status_ok and priority_ok and category_ok:
+            total += count
+
+    return {'total': total, 'facets': facets}
+
+
+def _valid(enum_cls, value):
+    # Unknown values are ignored, as in the task list filters
+    try:
+        return enum_cls(value).value if value else None
+    except ValueError:
+        return None
+
+
+def get_facets(user_id, status=None, priority=None, category=None, search=None, include_archived=False):
+    """Facet counts for a user's tasks under the given filters, cached per task generation"""
+    status = _valid(TaskStatus, status)
+    priority = _valid(TaskPriority, priority)
+    key = (user_id, get_task_generation(user_id), status, priority, category or None,
+           search or None, include_archived)
+
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    result = _fold(_grouped_counts(user_id, search, include_archived), status, priority, category)
+
+    with _cache_lock:
+        _cache[key] = result
+        # Entries for older generations are never hit again and age out here
+        while len(_cache) > FACET_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -2,13 +2,22 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 
 
-def calculate_productivity_stats(tasks):
-    """Calculate productivity statistics from tasks"""
-    total_tasks = len(tasks)
+def _fold_counts(counts, archived_counts, key_type=str):
+    """Add precomputed archive counts into a live defaultdict of counts"""
+    for key, count in (archived_counts or {}).items():
+        counts[key_type(key)] += count
+
+
+def calculate_productivity_stats(tasks, archive_summary=None):
+    """Calculate productivity statistics from tasks (plus archived tasks, if summarized)"""
+    archived_total = archive_summary.total_tasks if archive_summary else 0
+    total_tasks = len(tasks) + archived_total
     completed_tasks = [t for t in tasks if t.status.value == 'Completed']
     pending_tasks = [t for t in tasks if t.status.value == 'Pending']
+    # Only completed tasks are ever archived
+    completed_count = len(completed_tasks) + archived_total
     
-    completion_rate = (len(completed_tasks) / total_tasks * 100) if total_tasks > 0 else 0
+    completion_rate = (completed_count / total_tasks * 100) if total_tasks > 0 else 0
     
     # Count by category
     category_counts = defaultdict(int)
@@ -21,9 +30,13 @@ def calculate_productivity_stats(tasks):
     for task in tasks:
         priority_counts[task.priority.value] += 1
     
+    if archive_summary:
+        _fold_counts(category_counts, archive_summary.category_counts)
+        _fold_counts(priority_counts, archive_summary.priority_counts)
+    
     return {
         'total_tasks': total_tasks,
-        'completed_tasks': len(completed_tasks),
+        'completed_tasks': completed_count,
         'pending_tasks': len(pending_tasks),
         'completion_rate': round(completion_rate, 2),
         'category_counts': dict(category_counts),
@@ -61,7 +74,7 @@ def get_weekly_productivity(tasks):
     return week_data
 
 
-def get_most_productive_time(tasks):
+def get_most_productive_time(tasks, archive_summary=None):
     """Analyze tasks to find most productive day and hour"""
     day_counts = defaultdict(int)
     hour_counts = defaultdict(int)
@@ -76,6 +89,11 @@ def get_most_productive_time(tasks):
             hour = reference_dt.hour
             hour_counts[hour] += 1
     
+    if archive_summary:
+        _fold_counts(day_counts, archive_summary.day_counts)
+        # JSON object keys are strings; hours are ints everywhere else
+        _fold_counts(hour_counts, archive_summary.hour_counts, key_type=int)
+    
     most_productive_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
     most_productive_hour = max(hour_counts.items(), key=lambda x: x[1])[0] if hour_counts else None
     
@@ -87,15 +105,18 @@ def get_most_productive_time(tasks):
     }
 
 
-def calculate_average_completion_time(tasks):
+def calculate_average_completion_time(tasks, archive_summary=None):
     """Calculate average time to complete tasks"""
     completed_tasks = [t for t in tasks if t.status.value == 'Completed']
     
-    if not completed_tasks:
-        return None
-    
     total_time = timedelta(0)
     valid_count = 0
+    if archive_summary:
+        total_time += timedelta(seconds=archive_summary.completion_seconds)
+        valid_count += archive_summary.completion_samples
+    
+    if not completed_tasks and valid_count == 0:
+        return None
     
     for task in completed_tasks:
         reference_completion = task.completed_at or task.updated_at
@@ -116,3 +137,37 @@ def calculate_average_completion_time(tasks):
         'sample_size': valid_count
     }
 
+
+
+def get_focus_distribution(sessions):
+    """Summarize Pomodoro focus time per hour of day and per task"""
+    hour_minutes = defaultdict(float)
+    task_minutes = defaultdict(float)
+    total_seconds = 0
+    
+    for session in sessions:
+        seconds = session.focus_seconds or 0
+        if seconds <= 0:
+            continue
+        total_seconds += seconds
+        if session.task_id is not None:
+            task_minutes[session.task_id] += seconds / 60
+        # Split the session across the hours it spans
+        cursor = session.started_at
+        remaining = seconds
+        while remaining > 0:
+            next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            chunk = min(remaining, (next_hour - cursor).total_seconds())
+            hour_minutes[cursor.hour] += chunk / 60
+            remaining -= chunk
+            cursor = next_hour
+    
+    most_focused_hour = max(hour_minutes.items(), key=lambda x: x[1])[0] if hour_minutes else None
+    
+    return {
+        'total_focus_minutes': round(total_seconds / 60, 1),
+        'session_count': len(sessions),
+        'most_focused_hour': most_focused_hour,
+        'hour_distribution': {hour: round(minutes, 1) for hour, minutes in hour_minutes.items()},
+        'task_distribution': {task_id: round(minutes, 1) for task_id, minutes in task_minutes.items()}
+    }
@@ -0,0 +1,275 @@
+"""Write-behind buffer for Pomodoro timer events.
+
+The timer reports frequent tick/complete events. They are merged in memory
+per (user, session) and written to pomodoro_sessions in batches, when
+enough events have arrived or the oldest one has waited long enough, and
+once more when the process exits. A session costs one row write per flush,
+not one per tick.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import DataError, IntegrityError
+from models import db, Task, PomodoroSession
+from utils.sharding import select_shard_for_user
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('start', 'tick', 'complete')
+# Longest focus time a single session may report
+MAX_SESSION_SECONDS = 4 * 60 * 60
+# Task ids are 32-bit signed integers in the database
+MAX_TASK_ID = 2 ** 31 - 1
+
+
+def _bounded_int(data, name, low, high):
+    """An optional integer field within [low, high]; raises ValueError"""
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except OverflowError:
+        # int() of an infinite float
+        raise ValueError(f'{name} is out of range')
+    if not low <= value <= high:
+        raise ValueError(f'{name} is out of range')
+    return value
+
+
+def _is_permanent(error):
+    """Errors a retry cannot fix: the data is bad, not the database unavailable"""
+    return isinstance(error, (IntegrityError, DataError, OverflowError))
+
+
+def parse_event(data):
+    """Validate one raw event dict; raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Event must be an object')
+    session_id = str(data.get('session_id') or '').strip()
+    if not session_id or len(session_id) > 64:
+        raise ValueError('session_id is required (at most 64 characters)')
+    if data.get('type') not in EVENT_TYPES:
+        raise ValueError(f"type must be one of: {', '.join(EVENT_TYPES)}")
+
+    elapsed = _bounded_int(data, 'elapsed_seconds', 0, MAX_SESSION_SECONDS) or 0
+    label = data.get('label')
+    return {
+        'session_id': session_id,
+        'type': data['type'],
+        'elapsed_seconds': elapsed,
+        'planned_seconds': _bounded_int(data, 'planned_seconds', 0, MAX_SESSION_SECONDS),
+        'task_id': _bounded_int(data, 'task_id', 1, MAX_TASK_ID),
+        'label': str(label).strip()[:50] if label else None,
+    }
+
+
+def _merge(state, event, now):
+    """Fold an event into a session state; merging is order-insensitive"""
+    started_at = now - timedelta(seconds=event['elapsed_seconds'])
+    if state is None:
+        state = {
+            'started_at': started_at,
+            'ended_at': None,
+            'focus_seconds': 0,
+            'planned_seconds': None,
+            'task_id': None,
+            'label': None,
+            'completed': False,
+        }
+    state['started_at'] = min(state['started_at'], started_at)
+    state['focus_seconds'] = max(state['focus_seconds'], event['elapsed_seconds'])
+    for field in ('planned_seconds', 'task_id', 'label'):
+        if event.get(field) is not None:
+            state[field] = event[field]
+    if event['type'] == 'complete':
+        state['completed'] = True
+        state['ended_at'] = now
+    return state
+
+
+def _merge_states(older, newer):
+    """Combine two buffered states of the same session"""
+    merged = dict(newer)
+    merged['started_at'] = min(older['started_at'], newer['started_at'])
+    merged['focus_seconds'] = max(older['focus_seconds'], newer['focus_seconds'])
+    merged['completed'] = older['completed'] or newer['completed']
+    merged['ended_at'] = newer['ended_at'] or older['ended_at']
+    for field in ('planned_seconds', 'task_id', 'label'):
+        if merged[field] is None:
+            merged[field] = older[field]
+    return merged
+
+
+class SessionBuffer:
+    """In-memory write-behind buffer of Pomodoro session state"""
+
+    def __init__(self, app, flush_size=100, flush_seconds=5.0):
+        self.app = app
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        # (user_id, client_session_id) -> merged session state
+        self._pending = {}
+        self._events = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Crash-safe shutdown: whatever is still buffered is written on exit
+        atexit.register(self.flush)
+
+    def add(self, user_id, events):
+        """Buffer parsed events for a user"""
+        now = datetime.utcnow()
+        with self._lock:
+            for event in events:
+                key = (user_id, event['session_id'])
+                self._pending[key] = _merge(self._pending.get(key), event, now)
+            self._events += len(events)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = self._events >= self.flush_size
+            self._ensure_flusher()
+        if full:
+            self._wake.set()
+
+    def pending_count(self):
+        """Number of sessions waiting to be written"""
+        return len(self._pending)
+
+    def _ensure_flusher(self):
+        # Started lazily so a preloading master never owns the thread
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='pomodoro-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=self.flush_seconds)
+            self._wake.clear()
+            with self._lock:
+                due = self._oldest is not None and (
+                    self._events >= self.flush_size
+                    or time.monotonic() - self._oldest >= self.flush_seconds
+                )
+            if due:
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Pomodoro flush failed')
+
+    def _requeue(self, key, state):
+        with self._lock:
+            if key in self._pending:
+                state = _merge_states(state, self._pending[key])
+            self._pending[key] = state
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self):
+        """Write all buffered sessions, one transaction per user. Returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._events = 0
+            self._oldest = None
+        if not pending:
+            return 0
+
+        by_user = {}
+        for (user_id, session_id), state in pending.items():
+            by_user.setdefault(user_id, {})[session_id] = state
+
+        written = 0
+        # A fresh app context gives this flush its own session and shard selection
+        with self.app.app_context():
+            for user_id, sessions in by_user.items():
+                try:
+                    if not select_shard_for_user(user_id):
+                        raise RuntimeError(f'User {user_id} is being migrated')
+                    count = _write_sessions(user_id, sessions)
+                    db.session.commit()
+                    written += count
+                except Exception as e:
+                    db.session.rollback()
+                    if _is_permanent(e):
+                        # Find the bad session(s) so the rest still get written
+                        written += self._write_each(user_id, sessions)
+                        continue
+                    logger.exception('Could not write Pomodoro sessions for user %s; will retry', user_id)
+                    for session_id, state in sessions.items():
+                        self._requeue((user_id, session_id), state)
+            db.session.remove()
+        return written
+
+    def _write_each(self, user_id, sessions):
+        """Write sessions one per transaction, dropping those that can never be written"""
+        written = 0
+        for session_id, state in sessions.items():
+            try:
+                _write_sessions(user_id, {session_id: state})
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                if _is_permanent(e):
+                    logger.exception('Dropping Pomodoro session %s of user %s', session_id, user_id)
+                else:
+                    logger.exception('Could not write Pomodoro session %s of user %s; will retry',
+                                     session_id, user_id)
+                    self._requeue((user_id, session_id), state)
+        return written
+
+
+def _write_sessions(user_id, sessions):
+    """Upsert a user's buffered sessions (caller commits)"""
+    existing = {
+        row.client_session_id: row
+        for row in PomodoroSession.query.filter(
+            PomodoroSession.user_id == user_id,
+            PomodoroSession.client_session_id.in_(list(sessions))
+        )
+    }
+    task_ids = {s['task_id'] for s in sessions.values() if s['task_id'] is not None}
+    # Drop references to tasks the user does not own
+    valid_task_ids = {
+        row.id for row in db.session.query(Task.id).filter(Task.user_id == user_id, Task.id.in_(task_ids))
+    } if task_ids else set()
+
+    for session_id, state in sessions.items():
+        task_id = state['task_id'] if state['task_id'] in valid_task_ids else None
+        row = existing.get(session_id)
+        if row is None:
+            row = PomodoroSession(
+                user_id=user_id,
+                client_session_id=session_id,
+                started_at=state['started_at'],
+                focus_seconds=0,
+                completed=False
+            )
+            db.session.add(row)
+        row.started_at = min(row.started_at, state['started_at'])
+        row.focus_seconds = max(row.focus_seconds or 0, state['focus_seconds'])
+        row.completed = row.completed or state['completed']
+        row.ended_at = state['ended_at'] or row.ended_at
+        row.planned_seconds = state['planned_seconds'] or row.planned_seconds
+        row.label = state['label'] or row.label
+        if task_id is not None:
+            row.task_id = task_id
+    return len(sessions)
+
+
+def get_session_buffer():
+    """Get the buffer for the current app"""
+    from flask import current_app
+    return current_app.extensions['pomodoro_buffer']
+
+
+def init_app(app):
+    """Attach a session buffer configured from POMODORO_FLUSH_* settings"""
+    app.extensions['pomodoro_buffer'] = SessionBuffer(
+        app,
+        flush_size=app.config['POMODORO_FLUSH_SIZE'],
+        flush_seconds=app.config['POMODORO_FLUSH_SECONDS']
+    )
@@ -0,0 +1,102 @@
+"""Ranking for "what should I do next".
+
+A pending task's score is the sum of:
+
+- its priority weight (High / Medium / Low),
+- deadline_weight * urgency, where urgency is 1 for overdue or due today
+  and 1 / (1 + days left) after that (0 without a deadline),
+- age_weight * age in days / AGE_CAP_DAYS, capped at 1,
+- the weight given to its category, if any.
+
+Only the columns the score needs are streamed from the (user_id, status,
+deadline) index, and a heap of size k keeps the best tasks seen so far, so
+ranking costs O(n log k) time and O(k) memory however long the backlog is.
+"""
+import heapq
+import math
+from datetime import datetime
+from sqlalchemy import select
+from models import db, Task, TaskStatus
+
+DEFAULT_WEIGHTS = {
+    'priority': {'High': 3.0, 'Medium': 2.0, 'Low': 1.0},
+    'deadline': 4.0,
+    'age': 1.0,
+    'category': {},
+}
+# Tasks older than this get the full age bonus
+AGE_CAP_DAYS = 30
+# Rows fetched from the cursor at a time
+STREAM_BATCH = 500
+
+
+def _parse_weight(name, value):
+    weight = float(value)
+    # float() accepts nan and inf, which would make every score incomparable
+    if not math.isfinite(weight):
+        raise ValueError(f'{name} must be a finite number')
+    return weight
+
+
+def parse_weights(args, defaults=None):
+    """Build weights from request args, falling back to `defaults`.
+
+    Accepts `deadline_weight`, `age_weight`, `priority_weights=High:3,Low:1`
+    and `category_weights=work:2,chores:-1`. Raises ValueError.
+    """
+    defaults = defaults or DEFAULT_WEIGHTS
+    weights = {
+        'priority': dict(defaults['priority']),
+        'deadline': float(defaults['deadline']),
+        'age': float(defaults['age']),
+        'category': dict(defaults['category']),
+    }
+    if args.get('deadline_weight') is not None:
+        weights['deadline'] = _parse_weight('deadline_weight', args['deadline_weight'])
+    if args.get('age_weight') is not None:
+        weights['age'] = _parse_weight('age_weight', args['age_weight'])
+    for arg, key in (('priority_weights', 'priority'), ('category_weights', 'category')):
+        if args.get(arg):
+            for item in args[arg].split(','):
+                name, sep, value = item.rpartition(':')
+                if not sep or not name.strip():
+                    raise ValueError(f'Invalid {arg} entry: {item!r}')
+                weights[key][name.strip()] = _parse_weight(f'{arg} entry {item!r}', value)
+    return weights
+
+
+def score_task(priority, deadline, created_at, category, weights, now):
+    """Score one task; higher means do it sooner"""
+    score = weights['priority'].get(priority.value, 0.0)
+    if deadline is not None:
+        days_left = (deadline - now.date()).days
+        score += weights['deadline'] * (1.0 if days_left <= 0 else 1.0 / (1 + days_left))
+    if created_at is not None:
+        age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+        score += weights['age'] * min(age_days / AGE_CAP_DAYS, 1.0)
+    if category:
+        score += weights['category'].get(category, 0.0)
+    return score
+
+
+def top_pending_tasks(user_id, k, weights, now=None):
+    """The user's k best-scoring pending tasks as (score, task) pairs, best first"""
+    now = now or datetime.utcnow()
+    stmt = (
+        select(Task.id, Task.priority, Task.deadline, Task.created_at, Task.category)
+        .where(Task.user_id == user_id, Task.status == TaskStatus.PENDING)
+        .execution_options(yield_per=STREAM_BATCH)
+    )
+
+    # Min-heap of the best k: (score, -id) so equal scores favour older tasks
+    heap = []
+    for task_id, priority, deadline, created_at, category in db.session.execute(stmt):
+        entry = (score_task(priority, deadline, created_at, category, weights, now), -task_id)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    ranked = sorted(heap, reverse=True)
+    tasks = {task.id: task for task in Task.query.filter(Task.id.in_([-neg_id for _, neg_id in ranked]))}
+    return [(score, tasks[-neg_id]) for score, neg_id in ranked if -neg_id in tasks]
@@ -0,0 +1,308 @@
+"""Recurrence rules and lazy occurrence expansion for task series.
+
+A series stores its rule once (daily / weekly / monthly, an RRULE subset).
+Occurrences are generated only for the date window a query asks for;
+only occurrences the user completes are materialized as rows in `tasks`.
+"""
+from calendar import monthrange
+from datetime import MAXYEAR, date, datetime, timedelta
+from math import gcd
+from sqlalchemy import select
+from models import db, Task, ArchivedTask, TaskSeries, TaskStatus, TaskPriority
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+# Longest window a single query may expand
+MAX_WINDOW_DAYS = 366
+# The Gregorian calendar repeats every 400 years
+GREGORIAN_CYCLE_MONTHS = 4800
+# Largest INTERVAL per frequency (ten years) and largest COUNT a rule may use
+MAX_INTERVAL = {'daily': 3660, 'weekly': 520, 'monthly': 120}
+MAX_COUNT = 10000
+# Give up on monthly rules that can never match (e.g. day 30 every 12 months from February)
+MAX_EMPTY_PERIODS = 48
+
+
+def parse_weekdays(value):
+    """Parse "MO,WE" into sorted weekday numbers (Monday = 0)"""
+    if not value:
+        return []
+    days = set()
+    for item in value.split(','):
+        item = item.strip().upper()
+        if item not in WEEKDAYS:
+            raise ValueError(f'Invalid weekday: {item!r}')
+        days.add(WEEKDAYS.index(item))
+    return sorted(days)
+
+
+def parse_rrule(text):
+    """Parse the supported RRULE subset into series fields.
+
+    Supports FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (weekly), BYMONTHDAY
+    (monthly, a single day), COUNT and UNTIL (YYYYMMDD). Raises ValueError.
+    """
+    text = text.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for item in text.split(';'):
+        if not item:
+            continue
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f'Invalid RRULE part: {item!r}')
+        parts[key.strip().upper()] = value.strip()
+
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'COUNT', 'UNTIL'}
+    if unsupported:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(unsupported))}")
+
+    fields = {
+        'frequency': parts.get('FREQ', '').lower(),
+        'interval': int(parts.get('INTERVAL', 1)),
+        'by_weekday': parts.get('BYDAY'),
+        'by_monthday': int(parts['BYMONTHDAY']) if 'BYMONTHDAY' in parts else None,
+        'count': int(parts['COUNT']) if 'COUNT' in parts else None,
+        'until': datetime.strptime(parts['UNTIL'][:8], '%Y%m%d').date() if 'UNTIL' in parts else None,
+    }
+    validate_rule(fields)
+    return fields
+
+
+def validate_rule(fields):
+    """Check recurrence fields, normalizing by_weekday; raises ValueError"""
+    if fields.get('frequency') not in FREQUENCIES:
+        raise ValueError(f"frequency must be one of: {', '.join(FREQUENCIES)}")
+    if not fields.get('interval') or fields['interval'] < 1:
+        raise ValueError('interval must be a positive integer')
+    if fields['interval'] > MAX_INTERVAL[fields['frequency']]:
+        raise ValueError(f"interval may be at most {MAX_INTERVAL[fields['frequency']]} for {fields['frequency']} rules")
+    if fields.get('by_weekday'):
+        if fields['frequency'] != 'weekly':
+            raise ValueError('by_weekday is only supported for weekly rules')
+        fields['by_weekday'] = ','.join(WEEKDAYS[d] for d in parse_weekdays(fields['by_weekday']))
+    if fields.get('by_monthday') is not None:
+        if fields['frequency'] != 'monthly':
+            raise ValueError('by_monthday is only supported for monthly rules')
+        if not 1 <= fields['by_monthday'] <= 31:
+            raise ValueError('by_monthday must be between 1 and 31')
+    if fields.get('count') is not None and not 1 <= fields['count'] <= MAX_COUNT:
+        raise ValueError(f'count must be between 1 and {MAX_COUNT}')
+
+
+def format_rrule(series):
+    """Render a series' rule as an RRULE string"""
+    parts = [f'FREQ={series.frequency.upper()}']
+    if series.interval and series.interval != 1:
+        parts.append(f'INTERVAL={series.interval}')
+    if series.by_weekday:
+        parts.append(f'BYDAY={series.by_weekday}')
+    if series.by_monthday:
+        parts.append(f'BYMONTHDAY={series.by_monthday}')
+    if series.count:
+        parts.append(f'COUNT={series.count}')
+    if series.until:
+        parts.append(f"UNTIL={series.until.strftime('%Y%m%d')}")
+    return ';'.join(parts)
+
+
+def _monthly_valid(first, year, month_index, monthday):
+    """Whether `monthday` exists in that month and is not before the series start"""
+    if monthday > monthrange(year, month_index + 1)[1]:
+        return False
+    return date(year, month_index + 1, monthday) >= first
+
+
+def _monthly_count(first, first_month, interval, monthday, periods):
+    """Occurrences of a monthly rule in its first `periods` periods"""
+    def valid(period):
+        return _monthly_valid(first, *divmod(first_month + period * interval, 12), monthday)
+
+    if periods <= GREGORIAN_CYCLE_MONTHS:
+        return sum(1 for period in range(periods) if valid(period))
+    # Month lengths repeat every 400 years, so count one cycle of periods
+    # and scale; period 0 is counted apart as it may precede the start date
+    cycle = GREGORIAN_CYCLE_MONTHS // gcd(interval, GREGORIAN_CYCLE_MONTHS)
+    full, rest = divmod(periods - 1, cycle)
+    per_cycle = sum(1 for period in range(1, cycle + 1) if valid(period))
+    return int(valid(0)) + full * per_cycle + sum(1 for period in range(1, rest + 1) if valid(period))
+
+
+def _candidates(series, from_date):
+    """Like _rule_dates, but ends cleanly where the next date would pass date.max"""
+    dates = _rule_dates(series, from_date)
+    while True:
+        try:
+            yield next(dates)
+        except (StopIteration, OverflowError):
+            return
+
+
+def _rule_dates(series, from_date):
+    """Yield (index, date) pairs of rule dates in order, starting at the period
+    containing `from_date`; index counts occurrences from the series start.
+
+    The index of the first yielded date is computed from the number of whole
+    periods skipped, so COUNT rules don't have to walk from the start either.
+    """
+    first = series.start_date
+    interval = series.interval or 1
+
+    if series.frequency == 'daily':
+        periods = max(0, (from_date - first).days) // interval
+        index = periods
+        day = first + timedelta(days=periods * interval)
+        while True:
+            yield index, day
+            index += 1
+            day += timedelta(days=interval)
+
+    elif series.frequency == 'weekly':
+        weekdays = parse_weekdays(series.by_weekday) or [first.weekday()]
+        week = first - timedelta(days=first.weekday())
+        periods = max(0, (from_date - week).days // 7) // interval
+        # The first week only has the weekdays on or after the start date
+        first_week = sum(1 for weekday in weekdays if weekday >= first.weekday())
+        index = first_week + (periods - 1) * len(weekdays) if periods else 0
+        week += timedelta(weeks=periods * interval)
+        while True:
+            for weekday in weekdays:
+                day = week + timedelta(days=weekday)
+                if day >= first:
+                    yield index, day
+                    index += 1
+            week += timedelta(weeks=interval)
+
+    elif series.frequency == 'monthly':
+        monthday = series.by_monthday or first.day
+        first_month = first.year * 12 + first.month - 1
+        from_month = from_date.year * 12 + from_date.month - 1
+        periods = max(0, from_month - first_month) // interval
+        if monthday <= 28:
+            # Every month has the day; only the first may fall before the start
+            index = periods - (1 if periods and monthday < first.day else 0)
+        else:
+            index = _monthly_count(first, first_month, interval, monthday, periods)
+        month = first_month + periods * interval
+        empty = 0
+        while empty < MAX_EMPTY_PERIODS:
+            year, month_index = divmod(month, 12)
+            if year > MAXYEAR:
+                return
+            # Months without that day (e.g. the 31st) are skipped, as in RFC 5545
+            if _monthly_valid(first, year, month_index, monthday):
+                empty = 0
+                yield index, date(year, month_index + 1, monthday)
+                index += 1
+            elif monthday > monthrange(year, month_index + 1)[1]:
+                empty += 1
+            month += interval
+
+
+def iter_occurrences(series, start, end):
+    """Lazily yield the occurrence dates of `series` within [start, end].
+
+    The generator jumps straight to the window, with or without COUNT.
+    """
+    for index, day in _candidates(series, max(start, series.start_date)):
+        if day > end or (series.until and day > series.until):
+            return
+        if series.count and index >= series.count:
+            return
+        if day >= start:
+            yield day
+
+
+class Occurrence:
+    """A not-yet-materialized occurrence of a series, shaped like a Task"""
+
+    id = None
+    status = TaskStatus.PENDING
+    completed_at = None
+    version = None
+
+    def __init__(self, series, day):
+        self.series_id = series.id
+        self.user_id = series.user_id
+        self.title = series.title
+        self.description = series.description
+        self.category = series.category
+        self.priority = series.priority
+        self.created_at = series.created_at
+        self.updated_at = series.updated_at
+        self.deadline = day
+        self.occurrence_date = day
+
+    def to_dict(self):
+        data = Task.to_dict(self)
+        data['virtual'] = True
+        return data
+
+
+def materialized_dates(series_ids, start, end):
+    """(series_id, date) pairs already stored as tasks (hot or archived) in the window"""
+    found = set()
+    for model in (Task, ArchivedTask):
+        rows = db.session.execute(
+            select(model.series_id, model.occurrence_date).where(
+                model.series_id.in_(series_ids),
+                model.occurrence_date >= start,
+                model.occurrence_date <= end
+            )
+        ).all()
+        found.update((row.series_id, row.occurrence_date) for row in rows)
+    return found
+
+
+def expand_occurrences(user_id, start, end, category=None, priority=None, search=None):
+    """Virtual occurrences of a user's series in [start, end], skipping materialized ones"""
+    query = TaskSeries.query.filter(
+        TaskSeries.user_id == user_id,
+        TaskSeries.start_date <= end,
+        db.or_(TaskSeries.until.is_(None), TaskSeries.until >= start)
+    )
+    if category:
+        query = query.filter(TaskSeries.category == category)
+    if priority:
+        try:
+            query = query.filter(TaskSeries.priority == TaskPriority(priority))
+        except ValueError:
+            pass
+    if search:
+        search_term = f'%{search}%'
+        query = query.filter(db.or_(
+            TaskSeries.title.like(search_term),
+            TaskSeries.description.like(search_term)
+        ))
+
+    series_list = query.all()
+    if not series_list:
+        return []
+    done = materialized_dates([s.id for s in series_list], start, end)
+    return [
+        Occurrence(series, day)
+        for series in series_list
+        for day in iter_occurrences(series, start, end)
+        if (series.id, day) not in done
+    ]
+
+
+def parse_window(args, default_start=None):
+    """Read a `from`/`to` date window from request args.
+
+    Returns (start, end), or None if no `to` was given. Raises ValueError for
+    bad dates or windows longer than MAX_WINDOW_DAYS.
+    """
+    if not args.get('to'):
+        return None
+    end = datetime.strptime(args['to'], '%Y-%m-%d').date()
+    if args.get('from'):
+        start = datetime.strptime(args['from'], '%Y-%m-%d').date()
+    else:
+        start = default_start or datetime.utcnow().date()
+    if end < start:
+        raise ValueError('to must not be before from')
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise ValueError(f'Window may span at most {MAX_WINDOW_DAYS} days')
+    return start, end
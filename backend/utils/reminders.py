@@ -0,0 +1,217 @@
+"""Deadline reminder scheduler.
+
+Keeps a min-heap of upcoming reminder events for pending tasks and emits
+'due' (the deadline is today) and 'overdue' (the deadline has passed)
+events. The heap only holds a sliding window of deadlines: it is filled in
+pages from the (status, deadline) index as time advances, and kept current
+by following task writes through the updated_at index. Nothing ever scans
+the whole tasks table.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from sqlalchemy import select, and_, or_
+from models import db, Task, TaskStatus
+from utils.sharding import for_each_shard
+
+logger = logging.getLogger(__name__)
+
+# Writes committed slightly out of updated_at order are still picked up
+CHANGE_FEED_OVERLAP = timedelta(seconds=5)
+
+
+def log_sink(event):
+    """Default sink: write the event to the application log"""
+    logger.info('Task %(task_id)s for user %(user_id)s is %(kind)s (deadline %(deadline)s)', event)
+
+
+def webhook_sink(url, timeout=5):
+    """Build a sink that POSTs each event as JSON to `url`"""
+    def send(event):
+        request = urllib.request.Request(
+            url, data=json.dumps(event).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            urllib.request.urlopen(request, timeout=timeout).close()
+        except Exception as e:
+            logger.warning('Reminder webhook failed: %s', e)
+    return send
+
+
+class DeadlineScheduler:
+    """Min-heaps of (fire_date, kind, task) reminder events for pending tasks"""
+
+    def __init__(self, horizon_days=7, overdue_lookback_days=1, page_size=1000, sinks=None):
+        self.horizon_days = horizon_days
+        self.overdue_lookback_days = overdue_lookback_days
+        self.page_size = page_size
+        self.sinks = sinks if sinks is not None else [log_sink]
+        # One heap per shard (a single None key when unsharded)
+        self._heaps = {}
+        # (shard, task_id) -> deadline for every task with a live heap entry
+        self._tracked = {}
+        # Deadlines strictly before this date have been loaded, per shard
+        self._loaded_until = {}
+        # Change feed position (updated_at high-water mark), per shard
+        self._seen_until = {}
+        # (shard, task_id) -> deadline already reported overdue, so later edits
+        # to the same task do not repeat it; pruned past the lookback window
+        self._overdue_sent = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tracked)
+
+    def _track(self, shard, task_id, user_id, deadline, today):
+        """Schedule reminders for a pending task, replacing any older deadline"""
+        key = (shard, task_id)
+        if self._tracked.get(key) == deadline or self._overdue_sent.get(key) == deadline:
+            return
+        self._tracked[key] = deadline
+        heap = self._heaps.setdefault(shard, [])
+        if deadline >= today:
+            heapq.heappush(heap, (deadline, 'due', task_id, user_id, deadline))
+        else:
+            heapq.heappush(heap, (today, 'overdue', task_id, user_id, deadline))
+
+    def _untrack(self, shard, task_id):
+        # Heap entries are dropped lazily when they no longer match _tracked
+        self._tracked.pop((shard, task_id), None)
+
+    def _load_window(self, shard, today):
+        """Load pending deadlines up to today + horizon, a page at a time"""
+        start = self._loaded_until.get(shard, today - timedelta(days=self.overdue_lookback_days))
+        end = today + timedelta(days=self.horizon_days)
+        if start >= end:
+            return
+
+        last = None
+        while True:
+            stmt = (
+                select(Task.id, Task.user_id, Task.deadline)
+                .where(Task.status == TaskStatus.PENDING, Task.deadline >= start, Task.deadline < end)
+                .order_by(Task.deadline, Task.id)
+                .limit(self.page_size)
+            )
+            if last:
+                # Keyset pagination on (deadline, id)
+                stmt = stmt.where(or_(
+                    Task.deadline > last[0],
+                    and_(Task.deadline == last[0], Task.id > last[1])
+                ))
+            rows = db.session.execute(stmt).all()
+            for task_id, user_id, deadline in rows:
+                self._track(shard, task_id, user_id, deadline, today)
+            if len(rows) < self.page_size:
+                break
+            last = (rows[-1].deadline, rows[-1].id)
+
+        self._loaded_until[shard] = end
+
+    def _follow_changes(self, shard, today, now):
+        """Apply task writes since the last poll via the updated_at index"""
+        since = self._seen_until.get(shard)
+        self._seen_until[shard] = now
+        if since is None:
+            # The window load already reflects everything written so far
+            return
+        since -= CHANGE_FEED_OVERLAP
+        loaded_until = self._loaded_until.get(shard)
+        oldest = today - timedelta(days=self.overdue_lookback_days)
+
+        last = None
+        while True:
+            stmt = (
+                select(Task.id, Task.user_id, Task.deadline, Task.status, Task.updated_at)
+                .where(Task.updated_at >= since)
+                .order_by(Task.updated_at, Task.id)
+                .limit(self.page_size)
+            )
+            if last:
+                stmt = stmt.where(or_(
+                    Task.updated_at > last[0],
+                    and_(Task.updated_at == last[0], Task.id > last[1])
+                ))
+            rows = db.session.execute(stmt).all()
+            for task_id, user_id, deadline, status, _ in rows:
+                in_window = (deadline is not None and loaded_until is not None
+                             and oldest <= deadline < loaded_until)
+                if status == TaskStatus.PENDING and in_window:
+                    self._track(shard, task_id, user_id, deadline, today)
+                else:
+                    # Completed, deadline cleared, long overdue, or past the window (loaded later)
+                    self._untrack(shard, task_id)
+            if len(rows) < self.page_size:
+                break
+            last = (rows[-1].updated_at, rows[-1].id)
+
+    def _still_pending(self, task_id, deadline):
+        """Check a task right before emitting (catches deletes the feed cannot see)"""
+        row = db.session.execute(
+            select(Task.status, Task.deadline).where(Task.id == task_id)
+        ).first()
+        return row is not None and row.status == TaskStatus.PENDING and row.deadline == deadline
+
+    def _fire_due(self, shard, today):
+        """Pop and emit every event scheduled for today or earlier"""
+        events = []
+        heap = self._heaps.setdefault(shard, [])
+        while heap and heap[0][0] <= today:
+            fire_date, kind, task_id, user_id, deadline = heapq.heappop(heap)
+            if self._tracked.get((shard, task_id)) != deadline:
+                continue
+            if not self._still_pending(task_id, deadline):
+                self._untrack(shard, task_id)
+                continue
+
+            if kind == 'due' and deadline < today:
+                kind = 'overdue'
+            events.append({
+                'kind': kind,
+                'task_id': task_id,
+                'user_id': user_id,
+                'deadline': deadline.isoformat()
+            })
+            if kind == 'due':
+                # Remind again once the deadline has passed
+                heapq.heappush(heap, (deadline + timedelta(days=1), 'overdue', task_id, user_id, deadline))
+            else:
+                self._untrack(shard, task_id)
+                self._overdue_sent[(shard, task_id)] = deadline
+        return events
+
+    def _prune_overdue_sent(self, today):
+        cutoff = today - timedelta(days=self.overdue_lookback_days)
+        self._overdue_sent = {k: d for k, d in self._overdue_sent.items() if d >= cutoff}
+
+    def tick(self, now=None):
+        """Advance the scheduler to `now` (UTC) and emit any due events"""
+        now = now or datetime.utcnow()
+        today = now.date()
+        events = []
+        with self._lock:
+            for shard in for_each_shard():
+                self._load_window(shard, today)
+                self._follow_changes(shard, today, now)
+                events.extend(self._fire_due(shard, today))
+            self._prune_overdue_sent(today)
+            db.session.remove()
+
+        for event in events:
+            for sink in self.sinks:
+                sink(event)
+        return events
+
+    def run_forever(self, interval=60):
+        """Tick every `interval` seconds until interrupted"""
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Reminder tick failed')
+            time.sleep(interval)
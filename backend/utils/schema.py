@@ -0,0 +1,152 @@
+import logging
+import threading
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_schema_lock = threading.Lock()
+
+
+# Columns added to existing tables after their first release
+SQLITE_ADDED_COLUMNS = {
+    'users': [
+        ('task_generation', 'INTEGER NOT NULL DEFAULT 0'),
+        ('category_generation', 'INTEGER NOT NULL DEFAULT 0'),
+    ],
+    'tasks': [
+        ('completed_at', 'DATETIME NULL'),
+        ('version', 'INTEGER NOT NULL DEFAULT 1'),
+        ('series_id', 'INTEGER NULL REFERENCES task_series(id)'),
+        ('occurrence_date', 'DATE NULL'),
+    ],
+    'archived_tasks': [
+        ('version', 'INTEGER NOT NULL DEFAULT 1'),
+        ('series_id', 'INTEGER NULL'),
+        ('occurrence_date', 'DATE NULL'),
+    ],
+}
+
+
+def _migrate_sqlite(engine):
+    """SQLite migration helper for dev: add columns missing from older databases"""
+    if engine.name != 'sqlite':
+        return
+    with engine.connect() as conn:
+        for table, columns in SQLITE_ADDED_COLUMNS.items():
+            cols = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+            col_names = {c[1] for c in cols}
+            for name, ddl in columns:
+                if name not in col_names:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+        conn.commit()
+
+
+# Tables whose ids must never be reused, with the archive table holding ids
+# that left them
+AUTOINCREMENT_TABLES = {
+    'tasks': 'archived_tasks',
+}
+
+
+def _rebuild_sqlite_autoincrement(engine):
+    """Rebuild tables created before they used AUTOINCREMENT, keeping their rows.
+
+    Without AUTOINCREMENT SQLite hands out MAX(id) + 1, so archiving the
+    newest task would give its id to the next one. SQLite can't alter a
+    table into AUTOINCREMENT, hence the copy.
+    """
+    if engine.name != 'sqlite':
+        return
+    for name, archive in AUTOINCREMENT_TABLES.items():
+        table = db.metadata.tables[name]
+        with engine.connect() as conn:
+            # Take the write lock first so concurrent workers rebuild only once
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            ddl = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': name}
+            ).scalar()
+            if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+                conn.rollback()
+                continue
+            existing = {c[1] for c in conn.execute(text(f'PRAGMA table_info({name})'))}
+            columns = ', '.join(c.name for c in table.columns if c.name in existing)
+            indexes = conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+                {'name': name}
+            ).scalars().all()
+            for index in indexes:
+                conn.exec_driver_sql(f'DROP INDEX {index}')
+            conn.exec_driver_sql(f'ALTER TABLE {name} RENAME TO {name}_old')
+            table.create(bind=conn)
+            conn.exec_driver_sql(f'INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_old')
+            conn.exec_driver_sql(f'DROP TABLE {name}_old')
+            # Start past archived ids too, in case the newest rows were already archived
+            conn.execute(text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT :name, 0 "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+            ), {'name': name})
+            conn.execute(text(
+                f"UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM {archive})) "
+                "WHERE name = :name"
+            ), {'name': name})
+            conn.commit()
+
+
+def _advance_mysql_auto_increment(engine):
+    """Keep AUTO_INCREMENT past archived ids on MySQL.
+
+    MySQL 8.0 persists the counter; 5.7 resets it to MAX(id) + 1 on restart,
+    which reuses the ids of archived rows.
+    """
+    if engine.name != 'mysql':
+        return
+    with engine.connect() as conn:
+        for name, archive in AUTOINCREMENT_TABLES.items():
+            archived = conn.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {archive}')).scalar()
+            current = conn.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {name}')).scalar()
+            if archived and archived >= current:
+                conn.execute(text(f'ALTER TABLE {name} AUTO_INCREMENT = {int(archived) + 1}'))
+        conn.commit()
+
+
+def _create_missing_indexes(engine, tables):
+    """create_all() skips existing tables, so add indexes introduced later"""
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def ensure_schema():
+    """Create missing tables and apply dev migrations, once per process"""
+    app = current_app._get_current_object()
+    if app.extensions.get('schema_ready'):
+        return
+    with _schema_lock:
+        if app.extensions.get('schema_ready'):
+            return
+        from utils.sharding import create_shard_tables, get_shard_engine, sharded_tables
+        try:
+            db.create_all()
+            create_shard_tables()
+            engines = [db.engine] + [get_shard_engine(name) for name in app.config.get('SHARDS', {})]
+            for engine in engines:
+                _migrate_sqlite(engine)
+                _rebuild_sqlite_autoincrement(engine)
+                _advance_mysql_auto_increment(engine)
+            _create_missing_indexes(db.engine, db.metadata.sorted_tables)
+            for name in app.config.get('SHARDS', {}):
+                _create_missing_indexes(get_shard_engine(name), sharded_tables())
+        except OperationalError as e:
+            if 'already exists' not in str(e.orig):
+                logger.exception('Schema setup failed')
+                raise
+            # Another worker created the same table or index first; retry on a later request
+            logger.info('Schema setup raced with another worker: %s', e.orig)
+            return
+        except Exception:
+            logger.exception('Schema setup failed')
+            raise
+        app.extensions['schema_ready'] = True
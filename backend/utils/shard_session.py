@@ -0,0 +1,34 @@
+from flask import current_app, g
+from sqlalchemy import inspect
+from flask_sqlalchemy.session import Session
+
+
+def bind_key_for(shard):
+    """SQLALCHEMY_BINDS key used for a shard name"""
+    return f'shard_{shard}'
+
+
+def is_directory_table(table):
+    """Directory tables stay on the default database; everything else is sharded"""
+    return table is not None and table.info.get('directory', False)
+
+
+class ShardedSession(Session):
+    """Session that routes sharded tables to the shard selected for this context.
+
+    Kept free of model imports so models.py can use it to build `db`.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and current_app.config.get('SHARDS'):
+            table = None
+            if mapper is not None:
+                table = inspect(mapper).local_table
+            elif clause is not None:
+                table = getattr(clause, 'table', None)
+            if table is not None and not is_directory_table(table):
+                shard = g.get('shard')
+                if shard is None:
+                    raise RuntimeError(f'No shard selected for table {table.name!r}')
+                return self._db.engines[bind_key_for(shard)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
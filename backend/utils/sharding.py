@@ -0,0 +1,372 @@
+"""User-keyed horizontal sharding.
+
+When ``SHARDS`` is configured (``SHARD_URLS=name=url,name=url``), every row
+belonging to a user (the ``users`` row, tasks, archived tasks, ...) lives on
+one shard database, and the default database only holds the small directory
+tables (``user_directory`` and ``id_blocks``). Without ``SHARDS`` all of this
+is a no-op and the app runs against the single default database as before.
+"""
+import bisect
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g
+from sqlalchemy import event, select, delete, update, insert, func, inspect
+from models import db, UserDirectory, IdBlock
+from utils.shard_session import bind_key_for, is_directory_table
+
+# Virtual nodes per shard on the hash ring
+RING_REPLICAS = 64
+# Ids reserved per round trip to the directory database
+ID_BLOCK_SIZE = 1000
+# Copies a move makes before giving up on a user whose rows keep changing
+MOVE_ATTEMPTS = 3
+
+
+def sharding_enabled():
+    """Check whether the current app is configured with shards"""
+    return bool(current_app.config.get('SHARDS'))
+
+
+def parse_shard_urls(value):
+    """Parse ``name=url,name=url`` into an ordered dict of shard URLs"""
+    shards = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition('=')
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f'Invalid shard entry: {item!r} (expected name=url)')
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+class HashRing:
+    """Consistent hash ring mapping user ids to shard names"""
+
+    def __init__(self, shards, replicas=RING_REPLICAS):
+        self._points = []
+        self._owners = {}
+        for shard in shards:
+            for i in range(replicas):
+                point = self._hash(f'{shard}#{i}')
+                self._points.append(point)
+                self._owners[point] = shard
+        self._points.sort()
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(str(key).encode('utf-8')).hexdigest()[:16], 16)
+
+    def shard_for(self, user_id):
+        """Get the shard a user id hashes to"""
+        if not self._points:
+            raise ValueError('Hash ring has no shards')
+        index = bisect.bisect(self._points, self._hash(user_id)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+def get_ring():
+    """Get (and cache on the app) the hash ring for the configured shards"""
+    ring = current_app.extensions.get('shard_ring')
+    if ring is None:
+        ring = HashRing(current_app.config['SHARDS'])
+        current_app.extensions['shard_ring'] = ring
+    return ring
+
+
+def get_shard_engine(shard):
+    """Get the engine for a shard name"""
+    return db.engines[bind_key_for(shard)]
+
+
+@contextmanager
+def using_shard(shard):
+    """Temporarily route sharded tables to `shard` (for CLI jobs and auth flows)"""
+    previous = g.get('shard')
+    g.shard = shard
+    try:
+        yield shard
+    finally:
+        g.shard = previous
+
+
+def for_each_shard():
+    """Yield once per shard with that shard selected (once with none if unsharded)"""
+    if not sharding_enabled():
+        yield None
+        return
+    for shard in current_app.config['SHARDS']:
+        with using_shard(shard):
+            yield shard
+        # Identity maps are per-session, not per-shard; keep shards apart
+        db.session.expunge_all()
+
+
+def select_shard_for_user(user_id):
+    """Select the shard holding `user_id` for the rest of this context.
+
+    Returns False while the user is being moved between shards, so callers
+    can ask the client to retry.
+    """
+    if not sharding_enabled():
+        return True
+    entry = db.session.get(UserDirectory, user_id)
+    if not entry:
+        # Unknown users fall back to where they would be placed
+        g.shard = get_ring().shard_for(user_id)
+        return True
+    if entry.state != 'active':
+        return False
+    g.shard = entry.shard
+    return True
+
+
+def find_user_entry(email):
+    """Look up a user's directory entry by email"""
+    return UserDirectory.query.filter_by(email=email).first()
+
+
+class IdAllocator:
+    """Hi/lo allocator handing out globally unique ids across shards.
+
+    Ids are reserved from the directory database in blocks, so inserts pay
+    one extra round trip per ID_BLOCK_SIZE rows, and a user's rows can move
+    between shards without colliding with ids already there.
+    """
+
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, name):
+        engine = db.engines[None]
+        with engine.begin() as conn:
+            updated = conn.execute(
+                update(IdBlock).where(IdBlock.name == name)
+                .values(next_id=IdBlock.next_id + self.block_size)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(IdBlock).values(name=name, next_id=1 + self.block_size))
+            end = conn.execute(select(IdBlock.next_id).where(IdBlock.name == name)).scalar_one()
+        return end - self.block_size, end
+
+    def allocate(self, name):
+        """Get the next id for sequence `name`"""
+        with self._lock:
+            start, end = self._blocks.get(name, (0, 0))
+            if start >= end:
+                start, end = self._reserve(name)
+            self._blocks[name] = (start + 1, end)
+            return start
+
+
+id_allocator = IdAllocator()
+
+
+@event.listens_for(db.Model, 'before_insert', propagate=True)
+def _assign_global_id(mapper, connection, target):
+    """Give new rows on sharded tables an id from the global allocator"""
+    if not sharding_enabled() or is_directory_table(mapper.local_table):
+        return
+    if 'id' in mapper.local_table.c and getattr(target, 'id', None) is None:
+        target.id = id_allocator.allocate(mapper.local_table.name)
+
+
+def sharded_tables():
+    """Sharded tables in dependency order"""
+    return [t for t in db.metadata.sorted_tables if not is_directory_table(t)]
+
+
+def create_shard_tables():
+    """Create the sharded tables on every configured shard"""
+    tables = sharded_tables()
+    for shard in current_app.config.get('SHARDS', {}):
+        db.metadata.create_all(bind=get_shard_engine(shard), tables=tables)
+
+
+def _user_filter(table, user_id):
+    """WHERE clause selecting a user's rows from a sharded table"""
+    if table.name == 'users':
+        return table.c.id == user_id
+    return table.c.user_id == user_id
+
+
+def _user_tables():
+    """Sharded tables holding per-user rows, in dependency order"""
+    return [t for t in sharded_tables() if t.name == 'users' or 'user_id' in t.c]
+
+
+def _read_user_rows(engine, tables, user_id):
+    """A user's rows per table, in primary key order"""
+    with engine.connect() as conn:
+        return {
+            t.name: [dict(r._mapping) for r in conn.execute(
+                select(t).where(_user_filter(t, user_id)).order_by(*t.primary_key.columns)
+            )]
+            for t in tables
+        }
+
+
+def _delete_user_rows(engine, tables, user_id):
+    with engine.begin() as conn:
+        for table in reversed(tables):
+            conn.execute(delete(table).where(_user_filter(table, user_id)))
+
+
+def _write_user_rows(engine, tables, user_id, rows):
+    """Replace a user's rows on `engine` with `rows` in one transaction"""
+    with engine.begin() as dst:
+        # Clear leftovers from an earlier interrupted copy
+        for table in reversed(tables):
+            dst.execute(delete(table).where(_user_filter(table, user_id)))
+        for table in tables:
+            if rows[table.name]:
+                dst.execute(insert(table), rows[table.name])
+
+
+def move_user(user_id, target, drain_seconds=1.0):
+    """Move all of a user's rows to shard `target`.
+
+    The directory entry is marked 'moving' first (requests for the user get
+    a retryable 503), in-flight requests are given `drain_seconds` to finish,
+    rows are copied in one transaction on the target, the directory is
+    flipped, and only then are the source rows deleted. A request that
+    outlives the drain and writes to the source is caught by re-reading the
+    source: before the flip the copy is redone, after it the source rows are
+    kept instead of deleted. Other users are never blocked.
+    """
+    entry = db.session.get(UserDirectory, user_id)
+    if not entry:
+        raise ValueError(f'User {user_id} is not in the directory')
+    source = entry.shard
+    if source == target:
+        return False
+    source_engine, target_engine = get_shard_engine(source), get_shard_engine(target)
+    tables = _user_tables()
+
+    entry.state = 'moving'
+    db.session.commit()
+    try:
+        if drain_seconds:
+            time.sleep(drain_seconds)
+
+        rows = _read_user_rows(source_engine, tables, user_id)
+        for _ in range(MOVE_ATTEMPTS):
+            _write_user_rows(target_engine, tables, user_id, rows)
+            latest = _read_user_rows(source_engine, tables, user_id)
+            if latest == rows:
+                break
+            rows = latest
+        else:
+            raise RuntimeError(f'User {user_id} kept changing on shard {source}; move aborted')
+
+        entry.shard = target
+        entry.state = 'active'
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # The directory still points at the source; drop the partial copy
+        _delete_user_rows(target_engine, tables, user_id)
+        entry.state = 'active'
+        db.session.commit()
+        raise
+
+    if _read_user_rows(source_engine, tables, user_id) != rows:
+        raise RuntimeError(
+            f'User {user_id} changed on shard {source} after being copied to {target}; '
+            f'the source rows were kept for inspection'
+        )
+    _delete_user_rows(source_engine, tables, user_id)
+    return True
+
+
+def _default_is_shard():
+    config = current_app.config
+    return config['SQLALCHEMY_DATABASE_URI'] in config['SHARDS'].values()
+
+
+def default_database_users():
+    """Users still stored in the default database from before sharding was enabled"""
+    engine = db.engines[None]
+    if _default_is_shard() or not inspect(engine).has_table('users'):
+        return 0
+    users = db.metadata.tables['users']
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(users)).scalar()
+
+
+def _advance_id_blocks(engine):
+    """Start the global id sequences above the ids already used in `engine`"""
+    from utils.schema import AUTOINCREMENT_TABLES
+    tops = {}
+    with engine.connect() as conn:
+        for table in sharded_tables():
+            if 'id' in table.c:
+                tops[table.name] = conn.execute(select(func.max(table.c.id))).scalar() or 0
+    # Archived rows keep the ids they had in the hot table
+    for name, archive in AUTOINCREMENT_TABLES.items():
+        tops[name] = max(tops.get(name, 0), tops.get(archive, 0))
+
+    with db.engines[None].begin() as conn:
+        for name, top in tops.items():
+            current = conn.execute(select(IdBlock.next_id).where(IdBlock.name == name)).scalar()
+            if current is None:
+                conn.execute(insert(IdBlock).values(name=name, next_id=top + 1))
+            elif current <= top:
+                conn.execute(update(IdBlock).where(IdBlock.name == name).values(next_id=top + 1))
+
+
+def import_default_database():
+    """Move users stored in the default database onto their shards.
+
+    For deployments switching to sharding: every user gets a directory entry
+    and their rows are copied to the shard the ring assigns, then deleted
+    from the default database. Ids are kept, and the global id sequences are
+    moved past them. Run it while the app is not serving; it can be re-run
+    after an interruption. Returns a list of (user_id, shard) imports.
+    """
+    if _default_is_shard():
+        raise ValueError('DATABASE_URL is also a shard; there is nothing to import')
+    default = db.engines[None]
+    tables = _user_tables()
+    _advance_id_blocks(default)
+
+    users = db.metadata.tables['users']
+    with default.connect() as conn:
+        rows = conn.execute(select(users.c.id, users.c.email).order_by(users.c.id)).all()
+
+    ring = get_ring()
+    imported = []
+    for user_id, email in rows:
+        if db.session.get(UserDirectory, user_id) is None:
+            shard = ring.shard_for(user_id)
+            _write_user_rows(get_shard_engine(shard), tables, user_id, _read_user_rows(default, tables, user_id))
+            db.session.add(UserDirectory(user_id=user_id, email=email, shard=shard, state='active'))
+            db.session.commit()
+            imported.append((user_id, shard))
+        # Also finishes users whose import was interrupted after the directory commit
+        _delete_user_rows(default, tables, user_id)
+    return imported
+
+
+def rebalance(dry_run=False, drain_seconds=1.0):
+    """Move every user whose shard no longer matches the hash ring.
+
+    After a shard is added to SHARDS only the users the ring now assigns
+    to it are moved. Returns a list of (user_id, source, target) moves.
+    """
+    ring = get_ring()
+    moves = []
+    for entry in UserDirectory.query.order_by(UserDirectory.user_id).all():
+        target = ring.shard_for(entry.user_id)
+        if target != entry.shard:
+            moves.append((entry.user_id, entry.shard, target))
+
+    if not dry_run:
+        for user_id, _, target in moves:
+            move_user(user_id, target, drain_seconds=drain_seconds)
+    return moves
@@ -0,0 +1,136 @@
+"""Single-statement write path for tasks.
+
+Mutations are issued as one conditional ``UPDATE ... WHERE id=? AND user_id=?``
+(plus ``AND version=?`` when the client sent ``If-Match``), returning the new
+row with ``RETURNING`` where the database supports it. The row lock is held
+only for that one statement and concurrent writers can no longer silently
+overwrite each other.
+"""
+from datetime import datetime
+from sqlalchemy import update, select, case, literal, inspect
+from models import db, User, Task, TaskStatus
+
+
+class StaleVersionError(Exception):
+    """Raised when If-Match does not match the task's current version"""
+
+    def __init__(self, current_version):
+        super().__init__(f'Task was modified (current version {current_version})')
+        self.current_version = current_version
+
+
+def parse_if_match(header):
+    """Parse an If-Match header into a version number.
+
+    Accepts ``"3"``, ``W/"3"`` and bare ``3``. Returns None when the header is
+    absent or ``*``; raises ValueError for anything else.
+    """
+    if not header or header.strip() == '*':
+        return None
+    value = header.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    return int(value.strip('"'))
+
+
+def etag_for(task):
+    """ETag header value for a task"""
+    return f'"{task.version}"'
+
+
+def _status_literal(status):
+    return literal(status, Task.status.type)
+
+
+def toggle_values(now):
+    """SET clause flipping status and completed_at in the database.
+
+    completed_at comes first: MySQL evaluates assignments left to right, so
+    it must read the old status.
+    """
+    return [
+        (Task.completed_at, case((Task.status == TaskStatus.PENDING, now), else_=None)),
+        (Task.status, case(
+            (Task.status == TaskStatus.PENDING, _status_literal(TaskStatus.COMPLETED)),
+            else_=_status_literal(TaskStatus.PENDING)
+        )),
+    ]
+
+
+def status_values(new_status, now):
+    """SET clause for an explicit status change.
+
+    completed_at only changes when the status actually changes, matching
+    the old read-modify-write behaviour.
+    """
+    completed_at = now if new_status == TaskStatus.COMPLETED else None
+    return [
+        (Task.completed_at, case((Task.status != new_status, completed_at), else_=Task.completed_at)),
+        (Task.status, _status_literal(new_status)),
+    ]
+
+
+def bump_task_generation(*user_ids):
+    """Mark users' tasks as changed, in the caller's transaction.
+
+    Cached per-user task aggregates (utils/facets.py) are keyed by this
+    counter, so every write to tasks must call it before committing.
+    """
+    if not user_ids:
+        return
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(set(user_ids)))
+        .values(task_generation=User.task_generation + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _supports_returning():
+    bind = db.session.get_bind(mapper=inspect(Task))
+    return bind.dialect.update_returning
+
+
+def conditional_update(task_id, user_id, values, expected_version=None):
+    """Apply `values` (a list of (column, expression) pairs) to one task.
+
+    Returns the updated task, or None if the user has no such task. Raises
+    StaleVersionError if `expected_version` is given and does not match.
+    """
+    now = datetime.utcnow()
+    assignments = list(values) + [
+        (Task.updated_at, now),
+        (Task.version, Task.version + 1),
+    ]
+    stmt = update(Task).where(Task.id == task_id, Task.user_id == user_id)
+    if expected_version is not None:
+        stmt = stmt.where(Task.version == expected_version)
+    stmt = stmt.ordered_values(*assignments).execution_options(synchronize_session=False)
+
+    if _supports_returning():
+        task = db.session.scalars(
+            stmt.returning(Task), execution_options={'populate_existing': True}
+        ).first()
+        updated = task is not None
+        if updated:
+            # Keep the RETURNING values; a commit would expire them and force a reload
+            db.session.expunge(task)
+    else:
+        updated = db.session.execute(stmt).rowcount == 1
+        task = None
+
+    if not updated:
+        db.session.rollback()
+        current_version = db.session.scalar(
+            select(Task.version).where(Task.id == task_id, Task.user_id == user_id)
+        )
+        if current_version is None:
+            return None
+        raise StaleVersionError(current_version)
+
+    bump_task_generation(user_id)
+    db.session.commit()
+    if task is None:
+        # No RETURNING (MySQL): read back the committed row
+        task = db.session.get(Task, task_id, populate_existing=True)
+    return task
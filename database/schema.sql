@@ -12,10 +12,36 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash VARCHAR(255) NOT NULL,
     role ENUM('admin', 'user') DEFAULT 'user' NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    task_generation INT DEFAULT 0 NOT NULL,
+    category_generation INT DEFAULT 0 NOT NULL,
     INDEX idx_email (email)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Task Series Table (recurring tasks; occurrences are expanded on demand)
+CREATE TABLE IF NOT EXISTS task_series (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    category VARCHAR(50),
+    priority ENUM('Low', 'Medium', 'High') DEFAULT 'Medium' NOT NULL,
+    frequency VARCHAR(10) NOT NULL,
+    `interval` INT DEFAULT 1 NOT NULL,
+    by_weekday VARCHAR(30),
+    by_monthday INT,
+    start_date DATE NOT NULL,
+    until DATE,
+    count INT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_series_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Tasks Table
+-- Ids of archived tasks must not be handed out again. MySQL 8.0 persists the
+-- AUTO_INCREMENT counter; on older servers the backend moves it past
+-- archived_tasks at startup.
 CREATE TABLE IF NOT EXISTS tasks (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
@@ -28,12 +54,85 @@ CREATE TABLE IF NOT EXISTS tasks (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP NOT NULL,
     completed_at DATETIME NULL,
+    version INT DEFAULT 1 NOT NULL,
+    series_id INT NULL,
+    occurrence_date DATE NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (series_id) REFERENCES task_series(id),
+    UNIQUE INDEX uq_tasks_series_occurrence (series_id, occurrence_date),
     INDEX idx_user_id (user_id),
     INDEX idx_status (status),
     INDEX idx_priority (priority),
     INDEX idx_category (category),
     INDEX idx_deadline (deadline),
-    INDEX idx_completed_at (completed_at)
+    INDEX idx_completed_at (completed_at),
+    INDEX idx_tasks_user_status_deadline (user_id, status, deadline),
+    INDEX idx_tasks_user_facets (user_id, status, priority, category),
+    INDEX idx_tasks_status_deadline (status, deadline),
+    INDEX idx_tasks_updated_at (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Task Categories Table (per-user category usage counts for autocomplete)
+CREATE TABLE IF NOT EXISTS task_categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    usage_count INT DEFAULT 0 NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_task_categories_user_name (user_id, name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- Archived Tasks Table (cold storage for long-completed tasks)
+CREATE TABLE IF NOT EXISTS archived_tasks (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    category VARCHAR(50),
+    priority ENUM('Low', 'Medium', 'High') NOT NULL,
+    deadline DATE,
+    status ENUM('Pending', 'Completed') NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    completed_at DATETIME NULL,
+    version INT DEFAULT 1 NOT NULL,
+    series_id INT NULL,
+    occurrence_date DATE NULL,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_archived_user_id (user_id),
+    INDEX idx_archived_series_id (series_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Archive Summaries Table (precomputed analytics over archived tasks)
+CREATE TABLE IF NOT EXISTS archive_summaries (
+    user_id INT PRIMARY KEY,
+    total_tasks INT DEFAULT 0 NOT NULL,
+    category_counts JSON NOT NULL,
+    priority_counts JSON NOT NULL,
+    day_counts JSON NOT NULL,
+    hour_counts JSON NOT NULL,
+    completion_seconds DOUBLE DEFAULT 0 NOT NULL,
+    completion_samples INT DEFAULT 0 NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Pomodoro Sessions Table (focus time reported by the timer, written in batches)
+CREATE TABLE IF NOT EXISTS pomodoro_sessions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    task_id INT NULL,
+    client_session_id VARCHAR(64) NOT NULL,
+    label VARCHAR(50) NULL,
+    started_at DATETIME NOT NULL,
+    ended_at DATETIME NULL,
+    planned_seconds INT NULL,
+    focus_seconds INT DEFAULT 0 NOT NULL,
+    completed BOOLEAN DEFAULT FALSE NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_pomodoro_user_session (user_id, client_session_id),
+    INDEX idx_pomodoro_task_id (task_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -1,4 +1,4 @@
-import { useEffect } from 'react';
+import { useEffect, useState } from 'react';
 import { tasksAPI } from '../services/api';
 import { X } from 'lucide-react';
 import toast from 'react-hot-toast';
@@ -27,6 +27,7 @@ export default function TaskModal({ task, isOpen, onClose }) {
     register,
     handleSubmit,
     reset,
+    watch,
     formState: { errors, isSubmitting },
   } = useForm({
     resolver: zodResolver(schema),
@@ -39,6 +40,20 @@ export default function TaskModal({ task, isOpen, onClose }) {
     },
   });
 
+  const categoryInput = watch('category');
+  const [categorySuggestions, setCategorySuggestions] = useState([]);
+
+  // Suggest existing categories as the user types (debounced)
+  useEffect(() => {
+    if (!isOpen) return;
+    const timer = setTimeout(() => {
+      tasksAPI.getCategories({ prefix: categoryInput || '' })
+        .then((res) => setCategorySuggestions(res.data.categories))
+        .catch(() => setCategorySuggestions([]));
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [categoryInput, isOpen]);
+
   useEffect(() => {
     if (task) {
       reset({
@@ -96,7 +111,12 @@ export default function TaskModal({ task, isOpen, onClose }) {
         <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
           <div>
             <label className="block text-sm font-medium text-gray-700 dark:text-gray-300 mb-2">Category</label>
-            <Input placeholder="e.g., Work, Personal" {...register('category')} />
+            <Input placeholder="e.g., Work, Personal" list="category-suggestions" autoComplete="off" {...register('category')} />
+            <datalist id="category-suggestions">
+              {categorySuggestions.map((c) => (
+                <option key={c.name} value={c.name} />
+              ))}
+            </datalist>
             {errors.category && (
               <p className="mt-1 text-sm text-red-600">{errors.category.message}</p>
             )}
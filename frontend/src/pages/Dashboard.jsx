@@ -12,12 +12,14 @@ export default function Dashboard() {
   const [dashboardData, setDashboardData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [recentTasks, setRecentTasks] = useState([]);
+  const [nextTasks, setNextTasks] = useState([]);
   // keep relative times fresh
   useLiveTicker(60000);
 
   useEffect(() => {
     fetchDashboardData();
     fetchRecentTasks();
+    fetchNextTasks();
   }, []);
 
   const fetchDashboardData = async () => {
@@ -40,6 +42,15 @@ export default function Dashboard() {
     }
   };
 
+  const fetchNextTasks = async () => {
+    try {
+      const response = await tasksAPI.getNext({ limit: 3 });
+      setNextTasks(response.data.tasks);
+    } catch (error) {
+      console.error('Failed to fetch next tasks');
+    }
+  };
+
   if (loading) {
     return (
       <div>
@@ -214,6 +225,37 @@ export default function Dashboard() {
         </div>
       </div>
 
+      {/* Up Next */}
+      {nextTasks.length > 0 && (
+        <div className="card mb-8">
+          <h2 className="text-xl font-semibold text-gray-900 dark:text-white mb-4">Up Next</h2>
+          <div className="space-y-3">
+            {nextTasks.map((task) => (
+              <div
+                key={task.id}
+                className="flex items-center justify-between p-4 bg-gray-50 dark:bg-gray-700 rounded-lg"
+              >
+                <div className="flex items-center space-x-3">
+                  <Circle className="text-gray-400" size={20} />
+                  <div>
+                    <p className="font-medium text-gray-900 dark:text-white">{task.title}</p>
+                    <p className="text-sm text-gray-500 dark:text-gray-400">
+                      {task.priority}{task.category ? ` · ${task.category}` : ''}
+                    </p>
+                  </div>
+                </div>
+                {task.deadline && (
+                  <div className="flex items-center space-x-2 text-sm text-gray-600 dark:text-gray-400">
+                    <Calendar size={16} />
+                    <span>{new Date(task.deadline).toLocaleDateString()}</span>
+                  </div>
+                )}
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Recent Tasks */}
       <div className="card">
         <h2 className="text-xl font-semibold text-gray-900 dark:text-white mb-4">Recent Tasks</h2>
@@ -1,8 +1,15 @@
 import { useEffect, useMemo, useRef, useState } from 'react';
 import Button from '../components/ui/Button';
 import Input from '../components/ui/Input';
+import { pomodoroAPI } from '../services/api';
 import { Play, Pause, RotateCcw, Clock, Bell } from 'lucide-react';
 
+// Progress is reported to the server this often while the timer runs
+const TICK_EVERY_SECONDS = 15;
+
+const newSessionId = () =>
+  window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 export default function Pomodoro() {
   const [minutes, setMinutes] = useState(25); // default 25 mins
   const [secondsLeft, setSecondsLeft] = useState(25 * 60);
@@ -10,6 +17,26 @@ export default function Pomodoro() {
   const [label, setLabel] = useState('Focus');
   const intervalRef = useRef(null);
   const bellRef = useRef(null);
+  // Current focus session: { id, elapsed, planned, label }
+  const sessionRef = useRef(null);
+
+  // Best-effort: the timer keeps working if the server is unreachable
+  const sendEvent = (type) => {
+    const session = sessionRef.current;
+    if (!session) return;
+    pomodoroAPI.sendEvents([{
+      session_id: session.id,
+      type,
+      elapsed_seconds: session.elapsed,
+      planned_seconds: session.planned,
+      label: session.label,
+    }]).catch(() => {});
+  };
+
+  const endSession = () => {
+    if (sessionRef.current?.elapsed) sendEvent('tick');
+    sessionRef.current = null;
+  };
 
   // keep seconds in sync when minute preset changes (only when not running)
   useEffect(() => {
@@ -23,6 +50,11 @@ export default function Pomodoro() {
   useEffect(() => {
     if (!isRunning) return;
     intervalRef.current = setInterval(() => {
+      const session = sessionRef.current;
+      if (session) {
+        session.elapsed += 1;
+        if (session.elapsed % TICK_EVERY_SECONDS === 0) sendEvent('tick');
+      }
       setSecondsLeft((s) => {
         if (s <= 1) {
           clearInterval(intervalRef.current);
@@ -36,6 +68,13 @@ export default function Pomodoro() {
     return () => clearInterval(intervalRef.current);
   }, [isRunning]);
 
+  useEffect(() => {
+    if (secondsLeft === 0 && sessionRef.current) {
+      sendEvent('complete');
+      sessionRef.current = null;
+    }
+  }, [secondsLeft]);
+
   const totalSeconds = useMemo(() => Math.max(60, Math.min(60 * 60, minutes * 60)), [minutes]);
   const progress = useMemo(() => 1 - secondsLeft / totalSeconds, [secondsLeft, totalSeconds]);
 
@@ -47,15 +86,24 @@ export default function Pomodoro() {
 
   const start = () => {
     if (secondsLeft <= 0) setSecondsLeft(totalSeconds);
+    if (!sessionRef.current && label !== 'Break') {
+      sessionRef.current = { id: newSessionId(), elapsed: 0, planned: totalSeconds, label };
+      sendEvent('start');
+    }
     setIsRunning(true);
   };
-  const pause = () => setIsRunning(false);
+  const pause = () => {
+    setIsRunning(false);
+    sendEvent('tick');
+  };
   const reset = () => {
+    endSession();
     setIsRunning(false);
     setSecondsLeft(totalSeconds);
   };
 
   const setPreset = (m, newLabel) => {
+    endSession();
     setLabel(newLabel);
     setIsRunning(false);
     setMinutes(m);
@@ -15,6 +15,7 @@ export default function Tasks() {
   const [filterStatus, setFilterStatus] = useState('');
   const [filterPriority, setFilterPriority] = useState('');
   const [filterCategory, setFilterCategory] = useState('');
+  const [facets, setFacets] = useState(null);
 
   // Re-render every minute to keep relative times fresh
   useLiveTicker(60000);
@@ -32,6 +33,10 @@ export default function Tasks() {
       if (filterCategory) params.category = filterCategory;
       if (searchTerm) params.search = searchTerm;
 
+      // Counts are decoration only; the list still loads if they fail
+      tasksAPI.getFacets(params)
+        .then((res) => setFacets(res.data.facets))
+        .catch(() => setFacets(null));
       const response = await tasksAPI.getAll(params);
       setTasks(response.data.tasks);
     } catch (error) {
@@ -85,7 +90,11 @@ export default function Tasks() {
     High: 'bg-red-100 text-red-800 dark:bg-red-900 dark:text-red-200',
   };
 
-  const categories = [...new Set(tasks.map((t) => t.category).filter(Boolean))];
+  const categories = facets
+    ? Object.keys(facets.category).sort()
+    : [...new Set(tasks.map((t) => t.category).filter(Boolean))];
+  const withCount = (facet, value) =>
+    facets && facets[facet][value] !== undefined ? `${value} (${facets[facet][value]})` : value;
 
   return (
     <div>
@@ -119,8 +128,8 @@ export default function Tasks() {
             className="input-field"
           >
             <option value="">All Status</option>
-            <option value="Pending">Pending</option>
-            <option value="Completed">Completed</option>
+            <option value="Pending">{withCount('status', 'Pending')}</option>
+            <option value="Completed">{withCount('status', 'Completed')}</option>
           </select>
           <select
             value={filterPriority}
@@ -128,9 +137,9 @@ export default function Tasks() {
             className="input-field"
           >
             <option value="">All Priorities</option>
-            <option value="Low">Low</option>
-            <option value="Medium">Medium</option>
-            <option value="High">High</option>
+            <option value="Low">{withCount('priority', 'Low')}</option>
+            <option value="Medium">{withCount('priority', 'Medium')}</option>
+            <option value="High">{withCount('priority', 'High')}</option>
           </select>
           <select
             value={filterCategory}
@@ -140,7 +149,7 @@ export default function Tasks() {
             <option value="">All Categories</option>
             {categories.map((cat) => (
               <option key={cat} value={cat}>
-                {cat}
+                {withCount('category', cat)}
               </option>
             ))}
           </select>
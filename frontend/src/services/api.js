@@ -76,6 +76,9 @@ export const tasksAPI = {
   update: (id, data) => api.put(`/api/tasks/${id}`, data),
   delete: (id) => api.delete(`/api/tasks/${id}`),
   toggleComplete: (id) => api.put(`/api/tasks/${id}/complete`),
+  getFacets: (params) => api.get('/api/tasks/facets', { params }),
+  getCategories: (params) => api.get('/api/tasks/categories', { params }),
+  getNext: (params) => api.get('/api/tasks/next', { params }),
 };
 
 // Analytics API
@@ -85,6 +88,13 @@ export const analyticsAPI = {
   getProductiveTime: () => api.get('/api/analytics/productive-time'),
   getCompletionTime: () => api.get('/api/analytics/completion-time'),
   getDashboard: () => api.get('/api/analytics/dashboard'),
+  getFocusTime: () => api.get('/api/analytics/focus'),
+};
+
+// Pomodoro API
+export const pomodoroAPI = {
+  sendEvents: (events) => api.post('/api/pomodoro/events', { events }),
+  getSessions: (params) => api.get('/api/pomodoro/sessions', { params }),
 };
 
 export default api;